@@ -3,7 +3,12 @@ Text anonymization package using NLTK for grammatically correct substitutions.
 Supports name and ID anonymization with extensible filter system.
 """
 from anonymizer.core import Anonymizer
-from anonymizer.base import BaseFilter
+from anonymizer.base import BaseFilter, Span, SpanPart
+from anonymizer.document import Document
+from anonymizer.mapping import SubstitutionMapping
+from anonymizer.packed import PackedMapping, pack_mapping
+from anonymizer.vault import PseudonymVault
 
 __version__ = "0.1.0"
-__all__ = ["Anonymizer", "BaseFilter"]
\ No newline at end of file
+__all__ = ["Anonymizer", "BaseFilter", "Document", "PackedMapping", "PseudonymVault", "Span",
+           "SpanPart", "SubstitutionMapping", "pack_mapping"]
\ No newline at end of file
@@ -1,11 +1,66 @@
-from typing import List
+from typing import List, NamedTuple, Optional, Tuple, TYPE_CHECKING
 from abc import ABC, abstractmethod
+import re
+
+if TYPE_CHECKING:
+    from anonymizer.document import Document
+    from anonymizer.mapping import MappingBuilder
+
+
+class SpanPart(NamedTuple):
+    """
+    A subfield of a detected entity, such as a title, first or last name.
+
+    Parts with replace=True each get their own placeholder; the others, like
+    a title, stay in the text. A label of None uses the entity type.
+    """
+    label: Optional[str]
+    start: int
+    end: int
+    replace: bool = True
+
+
+class Span(NamedTuple):
+    """
+    A detected entity with its character offsets in the document text.
+    """
+    start: int
+    end: int
+    # Used for placeholder numbering and default labels; None uses the filter name
+    entity_type: Optional[str]
+    parts: Tuple[SpanPart, ...]
+    score: float = 1.0
+
+    @classmethod
+    def simple(cls, start: int, end: int, entity_type: Optional[str] = None,
+               score: float = 1.0) -> 'Span':
+        """Create a span replaced by a single placeholder."""
+        return cls(start, end, entity_type, (SpanPart(None, start, end),), score)
+
+    def subfield(self, label: str) -> Optional[SpanPart]:
+        """
+        Get the part with the given label.
+
+        Args:
+            label: Part label, e.g. 'TITLE' or 'FIRST_NAME'
+
+        Returns:
+            The first matching part, or None
+        """
+        for part in self.parts:
+            if part.label == label:
+                return part
+        return None
 
 class BaseFilter(ABC):
     """
     Base class for all data filters.
     """
 
+    # Overlapping matches from different filters are resolved in favour of
+    # the higher priority, then the longer match.
+    priority = 0
+
     def __init__(self):
         """Initialize base filter."""
         pass
@@ -21,4 +76,61 @@ class BaseFilter(ABC):
         Returns:
             List of matched strings
         """
-        pass
\ No newline at end of file
+        pass
+
+    def find_in_document(self, document: 'Document') -> List[str]:
+        """
+        Find all instances of the target data type in an analyzed document.
+
+        Filters that use tokens or POS tags should override this to reuse the
+        analysis shared by the Anonymizer. The default falls back to find().
+
+        Args:
+            document: Analyzed document to search
+
+        Returns:
+            List of matches in the same format as find()
+        """
+        return self.find(document.text)
+
+    def find_spans(self, document: 'Document') -> List[Span]:
+        """
+        Find all matches in an analyzed document with their offsets.
+
+        The default is an adapter for filters that only return strings: it
+        locates every whole-word occurrence of the strings returned by
+        find_in_document(), or of their 'full' value for dict results.
+        Filters that know token offsets should override this.
+
+        Args:
+            document: Analyzed document to search
+
+        Returns:
+            List of spans
+        """
+        spans = []
+        for match in self.find_in_document(document):
+            if isinstance(match, dict):
+                match = match.get('full')
+            if not match:
+                continue
+            for m in re.finditer(rf"\b{re.escape(match)}\b", document.text):
+                spans.append(Span.simple(m.start(), m.end()))
+        return spans
+
+    def find_known_spans(self, document: 'Document', builder: 'MappingBuilder') -> List[Span]:
+        """
+        Find occurrences of entities that already have placeholders.
+
+        Called for every document anonymized with a builder, so filters that
+        mask every occurrence of what they detect can also mask values found
+        in earlier parts of a stream or session. The default finds nothing.
+
+        Args:
+            document: Analyzed document to search
+            builder: Builder holding the placeholders assigned so far
+
+        Returns:
+            List of spans
+        """
+        return []
@@ -0,0 +1,346 @@
+"""
+Command line tool for anonymizing and restoring files in bulk.
+
+    anonymizer hide notes/ --output-dir anon/ --mapping notes.map.jsonl --workers 8
+    anonymizer hide --jsonl --field body tickets.jsonl --mapping tickets.map.jsonl > anon.jsonl
+    anonymizer fill --jsonl --field body anon.jsonl --mapping tickets.map.jsonl > restored.jsonl
+    cat export.txt | anonymizer hide --mapping export.map.jsonl > export.anon.txt
+
+Plain-text files are one document each; JSONL inputs are one document per line.
+Stdin and plain-text files over 1 MiB are streamed with bounded memory.
+Mappings are written to a sidecar with one entry per document, in output order,
+which fill reads back in the same order. The sidecar is JSONL by default, or
+packed mappings back to back with --mapping-format binary.
+"""
+from typing import IO, Iterator, List, Mapping, Optional, TextIO, Tuple
+from collections import deque
+from itertools import groupby
+from pathlib import Path
+import argparse
+import json
+import mmap
+import os
+import sys
+import time
+from anonymizer.core import Anonymizer
+from anonymizer.mapping import SubstitutionMapping
+from anonymizer.packed import PackedMapping, pack_mapping
+from anonymizer.vault import PseudonymVault
+
+STDIN = '-'
+
+# Characters read at a time when streaming plain text
+CHUNK_SIZE = 65536
+
+# Plain-text files larger than this many bytes are streamed instead of read whole
+STREAM_SIZE = 1024 ** 2
+
+
+class _Summary:
+    """Counts documents and characters for the final throughput line."""
+
+    def __init__(self):
+        self.documents = 0
+        self.characters = 0
+        self.started = time.perf_counter()
+
+    def add(self, text: str):
+        self.documents += 1
+        self.characters += len(text)
+
+    def report(self, command: str, stream: TextIO):
+        elapsed = time.perf_counter() - self.started
+        millions = self.characters / 1e6
+        rate = f"{self.documents / elapsed:.1f} docs/s, {millions / elapsed:.2f}M chars/s" if elapsed else "n/a"
+        print(f"{command}: {self.documents} documents, {millions:.2f}M characters in {elapsed:.2f}s ({rate})",
+              file=stream)
+
+
+def _sources(paths: List[str], pattern: str) -> Iterator[Tuple[str, Optional[Path], str]]:
+    """
+    Expand input paths into files.
+
+    Yields:
+        (name, path, relative output path) tuples; path is None for stdin
+    """
+    for name in paths or [STDIN]:
+        if name == STDIN:
+            yield STDIN, None, STDIN
+            continue
+        path = Path(name)
+        if path.is_dir():
+            for file in sorted(p for p in path.rglob(pattern) if p.is_file()):
+                yield str(file), file, str(file.relative_to(path))
+        else:
+            yield name, path, path.name
+
+
+def _open(path: Optional[Path]) -> TextIO:
+    """Open an input file, or return stdin."""
+    if path is None:
+        return sys.stdin
+    return open(path, encoding='utf-8')
+
+
+def _jsonl_documents(args) -> Iterator[Tuple[str, int, dict, str]]:
+    """
+    Read JSONL records.
+
+    Yields:
+        (source, line number, record, text of the selected field) tuples;
+        the text is empty for records without a string field
+    """
+    for name, path, _ in _sources(args.paths, args.pattern):
+        source = _open(path)
+        try:
+            for number, line in enumerate(source, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                value = record.get(args.field) if isinstance(record, dict) else None
+                yield name, number, record, value if isinstance(value, str) else ''
+        finally:
+            if path is not None:
+                source.close()
+
+
+def _streamed(source: Tuple[str, Optional[Path], str]) -> bool:
+    """Whether a plain-text input is stdin or a file large enough to be streamed."""
+    path = source[1]
+    return path is None or path.stat().st_size > STREAM_SIZE
+
+
+def _text_documents(sources: Iterator[Tuple[str, Optional[Path], str]]) -> Iterator[Tuple[str, str, str]]:
+    """
+    Read plain-text files whole.
+
+    Yields:
+        (source, relative output path, text) tuples
+    """
+    for name, path, relative in sources:
+        with open(path, encoding='utf-8') as source:
+            yield name, relative, source.read()
+
+
+def _read_chunks(path: Optional[Path], summary: _Summary) -> Iterator[str]:
+    """Read a plain-text input in chunks, counting it as one document."""
+    source = _open(path)
+    summary.documents += 1
+    try:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), ''):
+            summary.characters += len(chunk)
+            yield chunk
+    finally:
+        if path is not None:
+            source.close()
+
+
+def _mappings(path: str, binary: bool) -> Iterator[Mapping[str, str]]:
+    """Read mappings back from a sidecar file in document order."""
+    if binary:
+        if os.path.getsize(path) == 0:
+            return
+        with open(path, 'rb') as sidecar:
+            # The map stays open as long as any mapping still refers to it
+            buffer = mmap.mmap(sidecar.fileno(), 0, access=mmap.ACCESS_READ)
+        yield from PackedMapping.iter_buffer(buffer)
+        return
+
+    with open(path, encoding='utf-8') as sidecar:
+        for line in sidecar:
+            if line.strip():
+                yield SubstitutionMapping(json.loads(line)['mapping'])
+
+
+def _write_mapping(sidecar: Optional[IO], mapping: SubstitutionMapping, source: str,
+                   line: Optional[int] = None):
+    """Append one document's mapping to the sidecar file."""
+    if sidecar is None:
+        return
+    if 'b' in sidecar.mode:
+        sidecar.write(pack_mapping(mapping))
+        return
+    entry = {'source': source, 'mapping': dict(mapping)}
+    if line is not None:
+        entry['line'] = line
+    sidecar.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+def _write_text(args, relative: str, chunks: Iterator[str]):
+    """Write one plain-text document, given in chunks, to the output directory or stdout."""
+    if args.output_dir and relative != STDIN:
+        target = Path(args.output_dir) / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(target, 'w', encoding='utf-8') as output:
+            output.writelines(chunks)
+    else:
+        sys.stdout.writelines(chunks)
+
+
+def _hide_ordered(anonymizer: Anonymizer, items: Iterator[tuple], text_index: int, args):
+    """
+    Anonymize items in worker processes, pairing each result with its item.
+
+    Items are pulled lazily, so only the batch being processed is in memory.
+
+    Yields:
+        (item, anonymized text, mapping) tuples in input order
+    """
+    pending = deque()
+
+    def texts():
+        for item in items:
+            pending.append(item)
+            yield item[text_index]
+
+    for anonymized, mapping in anonymizer.hide_personal_data_many(
+            texts(), workers=args.workers, chunksize=args.chunksize):
+        yield pending.popleft(), anonymized, mapping
+
+
+def hide(args, anonymizer: Anonymizer, sidecar: Optional[IO], summary: _Summary):
+    """Anonymize the inputs of the hide command."""
+    if args.jsonl:
+        results = _hide_ordered(anonymizer, _jsonl_documents(args), 3, args)
+        for (source, number, record, text), anonymized, mapping in results:
+            summary.add(text)
+            if text:
+                record[args.field] = anonymized
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+            _write_mapping(sidecar, mapping, source, number)
+        return
+
+    for streamed, sources in groupby(_sources(args.paths, args.pattern), key=_streamed):
+        if not streamed:
+            for (source, relative, text), anonymized, mapping in _hide_ordered(
+                    anonymizer, _text_documents(sources), 2, args):
+                summary.add(text)
+                _write_text(args, relative, [anonymized])
+                _write_mapping(sidecar, mapping, source)
+            continue
+
+        # Stdin and large files are streamed in this process with bounded memory
+        for source, path, relative in sources:
+            stream = anonymizer.hide_personal_data_stream(
+                _read_chunks(path, summary), segment_size=CHUNK_SIZE)
+            _write_text(args, relative, stream)
+            _write_mapping(sidecar, stream.mapping, source)
+
+
+def fill(args, anonymizer: Anonymizer, summary: _Summary):
+    """Restore the inputs of the fill command."""
+    mappings = _mappings(args.mapping, args.mapping_format == 'binary') if args.mapping else None
+
+    def next_mapping():
+        # Without a sidecar the Anonymizer falls back to its vault
+        if mappings is None:
+            return None
+        mapping = next(mappings, None)
+        if mapping is None:
+            raise ValueError(f"{args.mapping} has fewer mappings than there are documents")
+        return mapping
+
+    if args.jsonl:
+        for _, _, record, text in _jsonl_documents(args):
+            mapping = next_mapping()
+            summary.add(text)
+            if text:
+                record[args.field] = anonymizer.fill_personal_data(text, mapping)
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return
+
+    for source in _sources(args.paths, args.pattern):
+        _, path, relative = source
+        if _streamed(source):
+            chunks = _read_chunks(path, summary)
+            _write_text(args, relative, anonymizer.fill_personal_data_stream(chunks, next_mapping()))
+            continue
+        for _, _, text in _text_documents([source]):
+            summary.add(text)
+            _write_text(args, relative, [anonymizer.fill_personal_data(text, next_mapping())])
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser of the command line tool."""
+    parser = argparse.ArgumentParser(
+        prog='anonymizer', description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='\n'.join(__doc__.strip().splitlines()[1:])
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('paths', nargs='*', help="files or directories; '-' or nothing reads stdin")
+    common.add_argument('--jsonl', action='store_true', help='inputs are JSON Lines, one document per line')
+    common.add_argument('--field', default='text', help='JSONL field to process (default: text)')
+    common.add_argument('--pattern', default='*', help="file pattern inside directories (default: '*')")
+    common.add_argument('--output-dir', help='write plain-text outputs here instead of stdout')
+    common.add_argument('--vault', help='SQLite pseudonym vault shared across runs')
+    common.add_argument('--mapping-format', choices=['jsonl', 'binary'], default='jsonl',
+                        help='sidecar format (default: jsonl)')
+    common.add_argument('--quiet', action='store_true', help='do not print the throughput summary')
+
+    hide_parser = commands.add_parser('hide', parents=[common], help='replace personal data with placeholders')
+    hide_parser.add_argument('--mapping', help='write mappings to this sidecar file')
+    hide_parser.add_argument('--filters', help='comma-separated filter names (default: all)')
+    hide_parser.add_argument('--no-grammar', action='store_true', help='do not fix articles before placeholders')
+    hide_parser.add_argument('--workers', type=int, default=1, help='worker processes (default: 1)')
+    hide_parser.add_argument('--chunksize', type=int, default=32, help='documents sent to a worker at a time')
+
+    fill_parser = commands.add_parser('fill', parents=[common], help='restore placeholders')
+    fill_parser.add_argument('--mapping', help='sidecar written by hide')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the command line tool.
+
+    Args:
+        argv: Arguments without the program name; defaults to sys.argv[1:]
+
+    Returns:
+        Process exit code
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == 'fill' and not args.mapping and not args.vault:
+        parser.error('fill needs --mapping or --vault')
+    if args.command == 'hide' and args.workers > 1 and args.vault == ':memory:':
+        parser.error('an in-memory vault cannot be shared with worker processes')
+
+    vault = PseudonymVault(args.vault) if args.vault else None
+    filters = args.filters.split(',') if getattr(args, 'filters', None) else None
+    anonymizer = Anonymizer(
+        filters=filters, preserve_grammar=not getattr(args, 'no_grammar', False), vault=vault
+    )
+    summary = _Summary()
+
+    try:
+        if args.command == 'hide':
+            if not args.mapping:
+                sidecar = None
+            elif args.mapping_format == 'binary':
+                sidecar = open(args.mapping, 'wb')
+            else:
+                sidecar = open(args.mapping, 'w', encoding='utf-8')
+            try:
+                hide(args, anonymizer, sidecar, summary)
+            finally:
+                if sidecar is not None:
+                    sidecar.close()
+        else:
+            fill(args, anonymizer, summary)
+    finally:
+        if vault is not None:
+            vault.close()
+
+    sys.stdout.flush()
+    if not args.quiet:
+        summary.report(args.command, sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,143 +1,517 @@
-import re
-from typing import Dict, List, Optional
-import nltk
-from anonymizer.base import BaseFilter
-from anonymizer.utils import load_filters, ensure_nltk_resources
+import asyncio
+import bisect
+import itertools
+import os
+import time
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, TextIO, Tuple, Union
+from anonymizer.base import Span
+from anonymizer.document import TIERS, Document, SentenceCache, get_sentence_cache
+from anonymizer.mapping import MappingBuilder, StreamingRestorer, SubstitutionMapping
+from anonymizer.registry import FilterSet
+from anonymizer.session import AnonymizationSession
+from anonymizer.stats import Stats, error_counts
+from anonymizer.stream import AnonymizingStream
+from anonymizer.vault import PseudonymVault
+from anonymizer.utils import get_sentence_tokenizer, get_word_tokenizer, get_tagger
+
+# Anonymizer owned by a batch worker process, created by _init_worker
+_worker_anonymizer: Optional['Anonymizer'] = None
+
+def _init_worker(filters: List[str], preserve_grammar: bool, vault_path: Optional[str],
+                 tier: str = 'accurate'):
+    """Build the worker's Anonymizer and load the NLTK models once."""
+    global _worker_anonymizer
+    vault = PseudonymVault(vault_path) if vault_path else None
+    _worker_anonymizer = Anonymizer(filters=filters, preserve_grammar=preserve_grammar, vault=vault,
+                                    tier=tier)
+    _worker_anonymizer.warm_up()
+
+def _hide_in_worker(text: str) -> Tuple[str, SubstitutionMapping]:
+    """Anonymize one document in a batch worker process."""
+    return _worker_anonymizer.hide_personal_data_with_mapping(text)
+
+# Anonymizers of an executor process by configuration, for the async API
+_executor_anonymizers: Dict[tuple, 'Anonymizer'] = {}
+
+def _hide_in_executor(config: tuple, text: str) -> Tuple[str, SubstitutionMapping]:
+    """Anonymize one document in an executor process, building its Anonymizer on first use."""
+    anonymizer = _executor_anonymizers.get(config)
+    if anonymizer is None:
+        filters, preserve_grammar, vault_path, tier = config
+        vault = PseudonymVault(vault_path) if vault_path else None
+        anonymizer = Anonymizer(filters=list(filters), preserve_grammar=preserve_grammar, vault=vault,
+                                tier=tier)
+        _executor_anonymizers[config] = anonymizer
+    return anonymizer.hide_personal_data_with_mapping(text)
+
+def _restore(mapping: SubstitutionMapping, text: str) -> str:
+    """Restore placeholders in an executor process."""
+    return mapping.restore(text)
+
+def _check_tier(tier: str) -> str:
+    """Validate a detection tier."""
+    if tier not in TIERS:
+        raise ValueError(f"Unknown detection tier {tier!r}; expected one of {', '.join(TIERS)}")
+    return tier
+
+def _lap(timings: Dict[str, float], stage: str, since: float) -> float:
+    """Record the time elapsed since the last lap and return the current time."""
+    now = time.perf_counter()
+    timings[stage] = now - since
+    return now
 
 class Anonymizer:
-    """Main anonymization class that handles text processing and filter management."""
+    """
+    Main anonymization class that handles text processing and filter management.
+
+    Filters and NLTK models are loaded once and only read afterwards, so a
+    single instance can serve many threads through hide_personal_data_with_mapping
+    and fill_personal_data(text, mapping).
+    """
+
+    def __init__(self, filters: Optional[List[str]] = None, preserve_grammar: bool = True,
+                 vault: Optional[PseudonymVault] = None, executor: Optional[Executor] = None,
+                 max_concurrency: Optional[int] = None, instrument: bool = False,
+                 metrics_callback: Optional[Callable[[dict], None]] = None,
+                 sentence_cache: Optional[SentenceCache] = None, tier: str = 'accurate'):
+        """
+        Initialize the anonymizer with specified filters.
 
-    def __init__(self, filters: Optional[List[str]] = None, preserve_grammar: bool = True):
-        """Initialize the anonymizer with specified filters."""
+        Args:
+            filters: Names of the filters to use; all registered filters if None.
+                See anonymizer.registry for adding filters.
+            preserve_grammar: Fix articles in front of placeholders
+            vault: Persistent store that keeps placeholders stable across documents
+            executor: Thread or process executor used by the async methods;
+                the event loop's default executor if None
+            max_concurrency: Maximum number of async calls running at once;
+                further calls wait their turn. Defaults to the CPU count.
+            instrument: Collect per-stage timings, match counts and document
+                sizes, readable through stats()
+            metrics_callback: Called with the measurements of every document;
+                implies instrument
+            sentence_cache: Cache of per-sentence tokens, tags and filter
+                results; the process-wide one if None. SentenceCache(0)
+                disables caching.
+            tier: Detection tier, one of 'fast' (regular expressions and
+                capitalization, no NLTK), 'balanced' (POS tags only for
+                sentences with a name candidate) and 'accurate'
+
+        Raises:
+            ValueError: If the tier is unknown
+        """
+        self.tier = _check_tier(tier)
         self.preserve_grammar = preserve_grammar
-        self._filters: Dict[str, BaseFilter] = {}
-        self._substitutions: Dict[str, str] = {}
-        self._reverse_substitutions: Dict[str, str] = {}
-
-        # Ensure NLTK resources are available
-        ensure_nltk_resources()
-
-        # Load specified filters or all available ones
-        available_filters = load_filters()
-        if filters is None:
-            self._filters = available_filters
-        else:
-            self._filters = {
-                f: filt for f, filt in available_filters.items()
-                if f.lower() in [x.lower() for x in filters]
-            }
-
-    def hide_personal_data(self, text: str) -> str:
-        """Replace personal data with placeholders while preserving context."""
-        if not text:
-            return text
+        self.vault = vault
+        self.executor = executor
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._stats = Stats(metrics_callback) if instrument or metrics_callback else None
+        self.sentence_cache = sentence_cache if sentence_cache is not None else get_sentence_cache()
+        self._mapping = SubstitutionMapping()
 
-        self._substitutions.clear()
-        self._reverse_substitutions.clear()
+        # Filters are built on first use and shared with other instances
+        self._filters: FilterSet = FilterSet(filters)
 
-        # First collect all matches from each filter
-        all_matches = {}
-        for filter_name, filter_obj in self._filters.items():
-            matches = filter_obj.find(text)
-            if matches:
-                all_matches[filter_name] = matches
-
-        # Process matches in reverse order of length to avoid partial replacements
-        result = text
-        for filter_name, matches in all_matches.items():
-            if filter_name == 'name':
-                # Special handling for names with titles
-                for idx, name_info in enumerate(matches, 1):
-                    if not name_info or name_info['full'] in self._reverse_substitutions:
-                        continue
-
-                    # Build placeholder preserving structure
-                    components = []
-
-                    # Keep title if present
-                    if name_info['title']:
-                        components.append(name_info['title'])
-
-                    # Add first name placeholder
-                    first_placeholder = f"<FIRST_NAME_{idx}>"
-                    components.append(first_placeholder)
-                    self._substitutions[first_placeholder] = name_info['first']
-
-                    # Add last name placeholder if present
-                    if name_info['last']:
-                        last_placeholder = f"<LAST_NAME_{idx}>"
-                        components.append(last_placeholder)
-                        self._substitutions[last_placeholder] = name_info['last']
-
-                    # Create the full replacement preserving surrounding context
-                    placeholder = ' '.join(components)
-                    self._reverse_substitutions[name_info['full']] = placeholder
-
-                    # Replace the name while preserving surrounding context
-                    pattern = rf"\b{re.escape(name_info['full'])}\b"
-                    result = re.sub(pattern, placeholder, result)
-
-            else:
-                # Standard handling for other filters
-                for idx, match in enumerate(matches, 1):
-                    if not match or match in self._reverse_substitutions:
-                        continue
-
-                    placeholder = f"<{filter_name.upper()}_{idx}>"
-                    self._substitutions[placeholder] = match
-                    self._reverse_substitutions[match] = placeholder
-
-                    # Use word boundaries for replacement
-                    pattern = rf"\b{re.escape(match)}\b"
-                    result = re.sub(pattern, placeholder, result)
-
-        if self.preserve_grammar:
-            result = self._ensure_grammar(result)
+    @property
+    def _substitutions(self) -> Mapping[str, str]:
+        """Placeholder to original value mapping of the last hide_personal_data call."""
+        return self._mapping
+
+    @property
+    def _reverse_substitutions(self) -> Mapping[str, str]:
+        """Original text to placeholder mapping of the last hide_personal_data call."""
+        return self._mapping.reverse
 
+    def hide_personal_data(self, text: str, tier: Optional[str] = None) -> str:
+        """
+        Replace personal data with placeholders while preserving context.
+
+        The mapping is kept on the instance for a later fill_personal_data call,
+        so this is not safe to share between threads; use
+        hide_personal_data_with_mapping for that.
+        """
+        result, self._mapping = self.hide_personal_data_with_mapping(text, tier)
         return result
 
-    def fill_personal_data(self, text: str) -> str:
-        """Replace placeholders with original personal data."""
+    def hide_personal_data_with_mapping(self, text: str,
+                                        tier: Optional[str] = None) -> Tuple[str, SubstitutionMapping]:
+        """
+        Replace personal data with placeholders and return the mapping.
+
+        Nothing is stored on the instance, so calls can run concurrently.
+
+        Args:
+            text: Input text
+            tier: Detection tier for this call; the instance's if None
+
+        Returns:
+            Anonymized text and the mapping needed to restore it
+        """
+        builder = self._new_builder()
+        if not text:
+            return text, builder.freeze()
+        return self._anonymize(text, builder, tier), builder.freeze()
+
+    async def hide_personal_data_async(self, text: str,
+                                       tier: Optional[str] = None) -> Tuple[str, SubstitutionMapping]:
+        """
+        Anonymize text without blocking the event loop.
+
+        The work runs in the configured executor. At most max_concurrency calls
+        run at once; the rest wait, which keeps executor queues short under
+        bursts.
+
+        Args:
+            text: Input text
+            tier: Detection tier for this call; the instance's if None
+
+        Returns:
+            Anonymized text and the mapping needed to restore it
+        """
+        if not text:
+            return self.hide_personal_data_with_mapping(text)
+        if isinstance(self.executor, ProcessPoolExecutor):
+            return await self._run_in_executor(self.executor, _hide_in_executor, self._config(tier), text)
+        return await self._run_in_executor(self.executor, self.hide_personal_data_with_mapping, text, tier)
+
+    async def fill_personal_data_async(self, text: str,
+                                       mapping: Optional[SubstitutionMapping] = None) -> str:
+        """
+        Restore placeholders without blocking the event loop.
+
+        Args:
+            text: Text containing placeholders
+            mapping: Mapping returned by hide; defaults as in fill_personal_data
+
+        Returns:
+            Text with the original values restored
+        """
         if not text:
             return text
+        if isinstance(self.executor, ProcessPoolExecutor):
+            if mapping is not None:
+                return await self._run_in_executor(self.executor, _restore, mapping, text)
+            # The vault or last mapping lives in this process; use a thread
+            return await self._run_in_executor(None, self.fill_personal_data, text)
+        return await self._run_in_executor(self.executor, self.fill_personal_data, text, mapping)
+
+    async def _run_in_executor(self, executor: Optional[Executor], func, *args):
+        """Run a function in an executor, bounded by the per-loop semaphore."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
 
-        result = text
-        # Sort substitutions by length of placeholder (longest first)
-        sorted_subs = sorted(
-            [(k, v) for k, v in self._substitutions.items()],
-            key=lambda x: len(x[0]),
-            reverse=True
+        async with semaphore:
+            return await loop.run_in_executor(executor, func, *args)
+
+    def _config(self, tier: Optional[str] = None) -> tuple:
+        """Configuration needed to rebuild this Anonymizer in another process."""
+        return (
+            tuple(self._filters), self.preserve_grammar,
+            self.vault.path if self.vault is not None else None,
+            _check_tier(tier) if tier else self.tier
         )
 
-        # Restore all placeholders
-        for placeholder, original in sorted_subs:
-            result = result.replace(placeholder, original)
+    def hide_personal_data_many(self, texts: Iterable[str], workers: Optional[int] = None,
+                                chunksize: int = 32) -> Iterator[Tuple[str, SubstitutionMapping]]:
+        """
+        Anonymize many documents using a pool of worker processes.
+
+        Each worker builds its own Anonymizer with the same filters and loads the
+        NLTK models once at startup. Input is consumed lazily in windows, so
+        arbitrarily long iterables can be processed. With a vault, each worker
+        opens the same database file, so it must not be ':memory:'.
+
+        Args:
+            texts: Documents to anonymize
+            workers: Number of worker processes; defaults to the CPU count.
+                With 1 worker the documents are processed in this process.
+            chunksize: Number of documents sent to a worker per task
+
+        Yields:
+            (anonymized text, mapping) tuples in input order
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            for text in texts:
+                yield self.hide_personal_data_with_mapping(text)
+            return
+
+        texts = iter(texts)
+        window = workers * chunksize * 4
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(list(self._filters), self.preserve_grammar,
+                      self.vault.path if self.vault is not None else None, self.tier)
+        ) as pool:
+            while True:
+                batch = list(itertools.islice(texts, window))
+                if not batch:
+                    break
+                yield from pool.map(_hide_in_worker, batch, chunksize=chunksize)
+
+    def hide_personal_data_stream(self, source: Union[Iterable[str], TextIO],
+                                  segment_size: int = 65536) -> AnonymizingStream:
+        """
+        Anonymize a stream of text chunks with bounded memory.
+
+        Args:
+            source: Iterable of text chunks or a text file object
+            segment_size: Number of characters collected before a segment is anonymized
+
+        Returns:
+            Iterable of anonymized chunks; its mapping attribute holds the
+            placeholders of the whole stream
+        """
+        return AnonymizingStream(self, source, segment_size=segment_size)
+
+    def session(self, text: str = '') -> AnonymizationSession:
+        """
+        Start an incremental session for a document that will be appended to or edited.
+
+        Args:
+            text: Initial document text
+
+        Returns:
+            Session holding the anonymized document and its mapping
+        """
+        return AnonymizationSession(self, text)
+
+    def stats(self) -> dict:
+        """
+        Get a snapshot of the instrumentation.
+
+        Stage timers are 'analyze' (sentence splitting and tokenization),
+        'filter:<name>' (including any tagging the filter triggers), 'tag',
+        'resolve', 'replace' (including article correction) and 'total'. Measurements are only
+        collected with instrument=True; handled error counts are always
+        available and cover the whole process. Documents anonymized in batch
+        worker processes are not included.
+
+        Returns:
+            Dictionary with 'enabled', 'documents', 'characters', 'stages',
+            'matches', 'sizes', 'caches' and 'errors'
+        """
+        snapshot = (self._stats or Stats()).snapshot()
+        snapshot['enabled'] = self._stats is not None
+        snapshot['caches'] = {'sentences': self.sentence_cache.info()}
+        if self.vault is not None:
+            snapshot['caches'].update(
+                {f"vault_{name}": info for name, info in self.vault.cache_info().items()}
+            )
+        snapshot['errors'] = error_counts()
+        return snapshot
+
+    def reset_stats(self):
+        """Discard the instrumentation collected so far."""
+        if self._stats is not None:
+            self._stats.reset()
+
+    def warm_up(self):
+        """Load the NLTK models used by the filters so the first call is not slowed down."""
+        get_sentence_tokenizer()
+        get_word_tokenizer()
+        get_tagger()
+
+    def _new_builder(self) -> MappingBuilder:
+        """Create the mapping builder for one anonymization call or stream."""
+        if self.vault is not None:
+            return self.vault.builder()
+        return MappingBuilder()
+
+    def _anonymize(self, text: str, builder: MappingBuilder, tier: Optional[str] = None,
+                   sentence_cache: Optional[SentenceCache] = None) -> str:
+        """
+        Replace personal data in non-empty text, assigning placeholders from the builder.
+
+        The anonymizer's sentence cache is used unless another one is given.
+        """
+        tier = _check_tier(tier) if tier else self.tier
+        # Timings are only taken when instrumentation is enabled
+        timings = {} if self._stats is not None else None
+        if timings is not None:
+            started = clock = time.perf_counter()
+
+        # Analyze the text once and share it between all filters
+        if sentence_cache is None:
+            sentence_cache = self.sentence_cache
+        document = Document.analyze(text, timings, sentence_cache, tier)
+        if timings is not None:
+            clock = _lap(timings, 'analyze', clock)
+
+        # Collect candidate spans from each filter
+        candidates = []
+        for filter_name, filter_obj in self._filters.items():
+            priority = filter_obj.priority
+            for span in filter_obj.find_spans(document):
+                candidates.append((priority, span, filter_name))
+            for span in filter_obj.find_known_spans(document, builder):
+                candidates.append((priority, span, filter_name))
+            if timings is not None:
+                clock = _lap(timings, f"filter:{filter_name}", clock)
+
+        spans = self._resolve_overlaps(candidates)
+        if timings is not None:
+            clock = _lap(timings, 'resolve', clock)
+
+        # Build the output in a single pass over the non-overlapping spans
+        result = self._replace_spans(text, spans, builder)
+        if timings is not None:
+            clock = _lap(timings, 'replace', clock)
+
+        if timings is not None:
+            timings['total'] = clock - started
+            matches = dict.fromkeys(self._filters, 0)
+            for _, filter_name in spans:
+                matches[filter_name] += 1
+            self._stats.record(len(text), timings, matches)
 
         return result
 
-    def _ensure_grammar(self, text: str) -> str:
-        """Ensure grammatical correctness of the anonymized text."""
-        try:
-            tokens = nltk.word_tokenize(text)
-            tagged = nltk.pos_tag(tokens)
-
-            result = text
-            for i, (word, tag) in enumerate(tagged):
-                if word.startswith('<') and word.endswith('>'):
-                    if i > 0:
-                        prev_word = tagged[i-1][0].lower()
-                        if prev_word in ['a', 'an']:
-                            if self._starts_with_vowel_sound(word):
-                                result = result.replace(f"{prev_word} {word}", f"an {word}")
-                            else:
-                                result = result.replace(f"{prev_word} {word}", f"a {word}")
-
-            return result
-
-        except Exception as e:
-            print(f"Error in grammar correction: {str(e)}")
+    def _resolve_overlaps(self, candidates: List[Tuple[int, Span, str]]) -> List[Tuple[Span, str]]:
+        """
+        Select non-overlapping spans, preferring higher priority, then longer
+        spans, then higher scores.
+
+        Args:
+            candidates: List of (priority, span, filter_name) tuples
+
+        Returns:
+            Accepted (span, filter_name) tuples in text order
+        """
+        candidates.sort(key=lambda c: (-c[0], c[1].start - c[1].end, -c[1].score, c[1].start))
+
+        starts: List[int] = []
+        accepted: List[Tuple[Span, str]] = []
+        for _, span, filter_name in candidates:
+            start, end = span.start, span.end
+            pos = bisect.bisect_right(starts, start)
+            # Overlaps the span starting before it, or the one starting after it
+            if pos > 0 and accepted[pos - 1][0].end > start:
+                continue
+            if pos < len(starts) and starts[pos] < end:
+                continue
+            starts.insert(pos, start)
+            accepted.insert(pos, (span, filter_name))
+
+        return accepted
+
+    def _replace_spans(self, text: str, spans: List[Tuple[Span, str]], builder: MappingBuilder) -> str:
+        """
+        Replace the parts of spans with placeholders assigned by the builder.
+
+        With preserve_grammar, an "a" or "an" right before a placeholder is
+        corrected in the same pass.
+
+        Args:
+            text: Original text
+            spans: Non-overlapping (span, filter_name) tuples in text order
+            builder: Builder recording the substitutions
+
+        Returns:
+            Text with placeholders
+        """
+        replaced = [
+            [part for part in span.parts if part.replace] for span, _ in spans
+        ]
+        entities = [
+            (span.entity_type or filter_name, [part.label for part in parts],
+             tuple(text[part.start:part.end] for part in parts))
+            for (span, filter_name), parts in zip(spans, replaced)
+        ]
+        builder.reserve(entities)
+
+        pieces = []
+        pos = 0
+        fix_articles = self.preserve_grammar
+
+        for parts, (entity_type, labels, values) in zip(replaced, entities):
+            placeholders = builder.placeholders(entity_type, labels, values)
+            for part, placeholder in zip(parts, placeholders):
+                gap = text[pos:part.start]
+                pieces.append(self._fix_article(gap, placeholder) if fix_articles else gap)
+                pieces.append(placeholder)
+                pos = part.end
+
+        pieces.append(text[pos:])
+        return ''.join(pieces)
+
+    def fill_personal_data(self, text: str, mapping: Optional[SubstitutionMapping] = None) -> str:
+        """
+        Replace placeholders with original personal data.
+
+        Args:
+            text: Text containing placeholders
+            mapping: Mapping returned by hide_personal_data_with_mapping;
+                defaults to the vault if one is configured, otherwise to the
+                mapping of the last hide_personal_data call
+
+        Returns:
+            Text with the original values restored
+        """
+        if not text:
             return text
 
+        if mapping is None:
+            mapping = self.vault if self.vault is not None else self._mapping
+        return mapping.restore(text)
+
+    def fill_personal_data_stream(self, deltas: Iterable[str],
+                                  mapping: Optional[SubstitutionMapping] = None) -> Iterator[str]:
+        """
+        Restore placeholders in a stream of text pieces, e.g. a streamed LLM reply.
+
+        Args:
+            deltas: Pieces of text in arrival order
+            mapping: Mapping returned by hide; defaults as in fill_personal_data
+
+        Yields:
+            Restored text as soon as it is unambiguous
+        """
+        if mapping is None:
+            mapping = self.vault if self.vault is not None else self._mapping
+        restorer = StreamingRestorer(mapping)
+        for delta in deltas:
+            restored = restorer.feed(delta)
+            if restored:
+                yield restored
+        restored = restorer.flush()
+        if restored:
+            yield restored
+
+    def _fix_article(self, gap: str, placeholder: str) -> str:
+        """
+        Fix an "a" or "an" at the end of the text in front of a placeholder.
+
+        Args:
+            gap: Original text between the previous replacement and the placeholder
+            placeholder: Placeholder about to be inserted
+
+        Returns:
+            The gap, with its last word corrected if it is an article
+        """
+        body = gap.rstrip()
+        if len(body) == len(gap):
+            return gap
+        for article in ('an', 'a'):
+            n = len(article)
+            word = body[-n:]
+            if word.lower() != article or (len(body) > n and body[-n - 1].isalnum()):
+                continue
+            wanted = 'an' if self._starts_with_vowel_sound(placeholder) else 'a'
+            if article == wanted:
+                return gap
+            if word[0].isupper():
+                wanted = wanted.capitalize()
+            return body[:-n] + wanted + gap[len(body):]
+        return gap
+
     def _starts_with_vowel_sound(self, word: str) -> bool:
         """Determine if a word starts with a vowel sound."""
         if word.startswith('<') and '_' in word:
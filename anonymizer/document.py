@@ -0,0 +1,419 @@
+"""
+Shared per-document analysis for filters.
+
+A Document is built once per anonymization call and handed to every filter,
+so sentence splitting, word tokenization and POS tagging are not repeated.
+Per-sentence results are also kept in a SentenceCache, so sentences repeated
+across documents, like signatures and disclaimers, are analyzed only once.
+"""
+from typing import Any, Callable, Dict, Hashable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from collections import OrderedDict
+import bisect
+import re
+import threading
+import time
+from nltk.tokenize.util import align_tokens
+from anonymizer.utils import get_sentence_tokenizer, get_word_tokenizer, get_tagger
+
+
+# Detection tiers, from cheapest to most accurate
+TIERS = ('fast', 'balanced', 'accurate')
+
+# Tokens of the fast tier: words with inner hyphens, apostrophes or periods,
+# or single other characters
+_FAST_TOKEN = re.compile(r"\w+(?:[-'’.]\w+)*|\S")
+
+# Sentences of the fast tier are lines
+_FAST_LINE = re.compile(r'[^\n]+')
+
+
+class Token(NamedTuple):
+    """A word token with its character offsets in the document text."""
+    text: str
+    start: int
+    end: int
+
+
+class _SentenceEntry:
+    """Cached analysis of a sentence text, with offsets relative to the sentence."""
+
+    __slots__ = ('spans', 'tags', 'results')
+
+    def __init__(self, spans: Tuple[Tuple[int, int], ...]):
+        self.spans = spans
+        self.tags: Optional[List[str]] = None
+        self.results: Dict[Hashable, Any] = {}
+
+
+class SentenceCache:
+    """
+    Bounded LRU cache of per-sentence tokens, POS tags and filter results.
+
+    Entries are keyed by the sentence text, so identical sentences in
+    different documents share one analysis. The cache is bounded both by
+    the number of sentences and by their total length, and sentences longer
+    than max_sentence_chars are not cached at all: text without sentence
+    breaks, such as logs, would otherwise keep huge entries alive. Safe to
+    share between threads.
+    """
+
+    def __init__(self, maxsize: int = 4096, max_chars: int = 1 << 20,
+                 max_sentence_chars: int = 4096):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of sentences kept; 0 disables caching
+            max_chars: Maximum total length of the sentences kept
+            max_sentence_chars: Length above which a sentence is not cached
+        """
+        self.maxsize = maxsize
+        self.max_chars = max_chars
+        self.max_sentence_chars = max_sentence_chars
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, text: str) -> Optional[_SentenceEntry]:
+        """Get the entry of a sentence text, or None."""
+        with self._lock:
+            entry = self._entries.get(text)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(text)
+            return entry
+
+    def put(self, text: str, entry: _SentenceEntry):
+        """Add an entry, evicting the least recently used ones beyond the limits."""
+        if len(text) > min(self.max_sentence_chars, self.max_chars):
+            return
+        with self._lock:
+            if text not in self._entries:
+                self._chars += len(text)
+            self._entries[text] = entry
+            self._entries.move_to_end(text)
+            self._evict()
+
+    def resize(self, maxsize: int, max_chars: Optional[int] = None):
+        """
+        Change the limits, evicting entries if needed.
+
+        Args:
+            maxsize: New maximum number of sentences; 0 disables caching
+            max_chars: New maximum total length; unchanged if None
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            if max_chars is not None:
+                self.max_chars = max_chars
+            self._evict()
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> Dict[str, float]:
+        """Hit and miss counts, hit rate, current size and total length."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits, 'misses': self.misses, 'size': len(self._entries),
+                'chars': self._chars, 'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _evict(self):
+        """Drop least recently used entries until both limits hold. Lock must be held."""
+        entries = self._entries
+        while entries and (len(entries) > self.maxsize or self._chars > self.max_chars):
+            text, _ = entries.popitem(last=False)
+            self._chars -= len(text)
+
+
+# Cache shared by all documents that are not given their own
+_shared_cache = SentenceCache()
+
+
+def get_sentence_cache() -> SentenceCache:
+    """
+    Get the process-wide sentence cache.
+
+    Returns:
+        SentenceCache used by Document.analyze by default
+    """
+    return _shared_cache
+
+
+class Sentence:
+    """
+    A sentence of a document with its tokens and lazily computed POS tags.
+    """
+
+    __slots__ = ('start', 'end', 'tokens', '_tags', '_timings', '_entry')
+
+    def __init__(self, start: int, end: int, tokens: List[Token],
+                 timings: Optional[Dict[str, float]] = None,
+                 entry: Optional[_SentenceEntry] = None):
+        """Initialize a sentence from its offsets and tokens."""
+        self.start = start
+        self.end = end
+        self.tokens = tokens
+        self._tags: Optional[List[str]] = None
+        self._timings = timings
+        self._entry = entry
+
+    @property
+    def tags(self) -> List[str]:
+        """POS tags of the tokens, computed on first access."""
+        if self._tags is None and not self._cached_tags():
+            words = [token.text for token in self.tokens]
+            if self._timings is None:
+                self._set_tags([tag for _, tag in get_tagger().tag(words)] if words else [])
+            else:
+                start = time.perf_counter()
+                self._set_tags([tag for _, tag in get_tagger().tag(words)] if words else [])
+                self._timings['tag'] = self._timings.get('tag', 0.0) + time.perf_counter() - start
+        return self._tags
+
+    @property
+    def is_tagged(self) -> bool:
+        """Whether the tags are known without running the tagger."""
+        return self._tags is not None or self._cached_tags()
+
+    def _cached_tags(self) -> bool:
+        """Take the tags from the sentence cache, if it has them."""
+        entry = self._entry
+        if entry is not None and entry.tags is not None:
+            self._tags = entry.tags
+            return True
+        return False
+
+    def _set_tags(self, tags: List[str]):
+        """Store computed tags here and in the sentence cache."""
+        self._tags = tags
+        if self._entry is not None:
+            self._entry.tags = tags
+
+    def has_cached(self, key: Hashable) -> bool:
+        """
+        Check whether a per-sentence filter result is already cached.
+
+        Args:
+            key: Key passed to cached()
+        """
+        return self._entry is not None and key in self._entry.results
+
+    def cached(self, key: Hashable, compute: Callable[['Sentence'], Any]) -> Any:
+        """
+        Get a per-sentence filter result, computing it once per sentence text.
+
+        The result must depend only on the sentence text and the key, and must
+        not contain absolute offsets; use token positions instead.
+
+        Args:
+            key: Identifies the filter and its configuration
+            compute: Called with this sentence on a cache miss
+
+        Returns:
+            The cached or computed result
+        """
+        entry = self._entry
+        if entry is None:
+            return compute(self)
+        result = entry.results.get(key)
+        if result is None:
+            result = compute(self)
+            entry.results[key] = result
+        return result
+
+    @property
+    def tagged(self) -> List[Tuple[str, str]]:
+        """List of (word, tag) tuples in the format returned by nltk.pos_tag."""
+        return list(zip((token.text for token in self.tokens), self.tags))
+
+
+class Document:
+    """
+    Analyzed document: sentences, tokens with character offsets, and POS tags.
+    """
+
+    def __init__(self, text: str, sentences: List[Sentence], tier: str = 'accurate'):
+        """Initialize a document from its text and analyzed sentences."""
+        self.text = text
+        self.sentences = sentences
+        self.tier = tier
+        self._tokens: Optional[List[Token]] = None
+        self._sentence_offsets: Optional[List[int]] = None
+
+    @classmethod
+    def analyze(cls, text: str, timings: Optional[Dict[str, float]] = None,
+                cache: Optional[SentenceCache] = None, tier: str = 'accurate') -> 'Document':
+        """
+        Split text into sentences and tokens.
+
+        Args:
+            text: Input text to analyze
+            timings: If given, time spent in POS tagging is added to its 'tag' entry
+            cache: Sentence cache to use; the process-wide one if None
+            tier: Detection tier filters should use, one of TIERS. The 'fast'
+                tier splits lines and tokens with regular expressions instead
+                of the NLTK tokenizers and does not use the cache.
+
+        Returns:
+            Analyzed document; POS tags are computed on first use
+        """
+        if tier == 'fast':
+            return cls(text, [
+                Sentence(line.start(), line.end(), [
+                    Token(m.group(), line.start() + m.start(), line.start() + m.end())
+                    for m in _FAST_TOKEN.finditer(line.group())
+                ], timings)
+                for line in _FAST_LINE.finditer(text)
+            ], tier)
+
+        if cache is None:
+            cache = _shared_cache
+        use_cache = cache.maxsize > 0
+
+        sentences = []
+        for start, end in get_sentence_tokenizer().span_tokenize(text):
+            sentence_text = text[start:end]
+            entry = cache.get(sentence_text) if use_cache else None
+            if entry is None:
+                spans = tuple(_token_spans(sentence_text))
+                if use_cache:
+                    entry = _SentenceEntry(spans)
+                    cache.put(sentence_text, entry)
+            else:
+                spans = entry.spans
+            tokens = [
+                Token(sentence_text[s:e], start + s, start + e)
+                for s, e in spans
+            ]
+            sentences.append(Sentence(start, end, tokens, timings, entry))
+        return cls(text, sentences, tier)
+
+    @property
+    def tokens(self) -> List[Token]:
+        """All tokens of the document in order."""
+        if self._tokens is None:
+            self._tokens = [token for sentence in self.sentences for token in sentence.tokens]
+        return self._tokens
+
+    @property
+    def tagged(self) -> List[Tuple[str, str]]:
+        """All (word, tag) tuples of the document in order. Tags every sentence."""
+        return [pair for sentence in self.sentences for pair in sentence.tagged]
+
+    def tag_sentences(self, sentences: Optional[Sequence[Sentence]] = None):
+        """
+        Tag several sentences with one tagger call.
+
+        Filters that know which sentences they will look at can call this
+        first, so a batching tagger backend scores them together. Sentences
+        that already have tags are skipped.
+
+        Args:
+            sentences: Sentences of this document; all of them if None
+        """
+        pending = [
+            sentence for sentence in (self.sentences if sentences is None else sentences)
+            if sentence.tokens and not sentence.is_tagged
+        ]
+        if not pending:
+            return
+        timings = pending[0]._timings
+        start = time.perf_counter()
+        tagged = get_tagger().tag_sents([[token.text for token in s.tokens] for s in pending])
+        for sentence, pairs in zip(pending, tagged):
+            sentence._set_tags([tag for _, tag in pairs])
+        if timings is not None:
+            timings['tag'] = timings.get('tag', 0.0) + time.perf_counter() - start
+
+    @property
+    def lazy_tagged(self) -> 'TaggedTokens':
+        """(word, tag) view of all tokens that only tags the sentences it is asked about."""
+        return TaggedTokens(self)
+
+    def tag_at(self, index: int) -> str:
+        """
+        Get the POS tag of a token, tagging only the sentence that contains it.
+
+        Args:
+            index: Position of the token in tokens
+
+        Returns:
+            POS tag of the token
+        """
+        if self._sentence_offsets is None:
+            offsets = []
+            count = 0
+            for sentence in self.sentences:
+                offsets.append(count)
+                count += len(sentence.tokens)
+            self._sentence_offsets = offsets
+        pos = bisect.bisect_right(self._sentence_offsets, index) - 1
+        return self.sentences[pos].tags[index - self._sentence_offsets[pos]]
+
+
+class TaggedTokens(Sequence):
+    """
+    Read-only sequence of (word, tag) tuples over a document's tokens.
+
+    Sentences are tagged on first access, so code that inspects only a few
+    positions does not pay for tagging the whole document.
+    """
+
+    __slots__ = ('_document',)
+
+    def __init__(self, document: Document):
+        """Initialize the view."""
+        self._document = document
+
+    def __len__(self) -> int:
+        return len(self._document.tokens)
+
+    def __getitem__(self, index: int) -> Tuple[str, str]:
+        if index < 0:
+            index += len(self)
+        return self._document.tokens[index].text, self._document.tag_at(index)
+
+
+def _token_spans(sentence: str) -> Iterator[Tuple[int, int]]:
+    """
+    Tokenize a sentence the way nltk.word_tokenize does and return token offsets.
+    """
+    raw_tokens = get_word_tokenizer().tokenize(sentence)
+
+    # The tokenizer rewrites double quotes to `` and ''; map them back so the
+    # tokens can be aligned against the original text.
+    if '"' in sentence or "''" in sentence:
+        matched = [m.group() for m in re.finditer(r"``|'{2}|\"", sentence)]
+        raw_tokens = [
+            matched.pop(0) if tok in ['"', "``", "''"] and matched else tok
+            for tok in raw_tokens
+        ]
+
+    try:
+        return iter(align_tokens(raw_tokens, sentence))
+    except ValueError:
+        # Fall back to aligning token by token, skipping anything not found
+        spans = []
+        point = 0
+        for tok in raw_tokens:
+            start = sentence.find(tok, point)
+            if start < 0:
+                continue
+            point = start + len(tok)
+            spans.append((start, point))
+        return iter(spans)
@@ -1,32 +1,26 @@
-from typing import List
-import nltk
+from typing import List, Sequence, TYPE_CHECKING
 import re
-from anonymizer.base import BaseFilter
+from anonymizer.base import BaseFilter, Span
+from anonymizer.document import Document, Token
+from anonymizer.stats import record_error
+from anonymizer.utils import MissingResourceError
+
+if TYPE_CHECKING:
+    from anonymizer.mapping import MappingBuilder
 
 class IdFilter(BaseFilter):
     """
     Filter for detecting and anonymizing ID numbers using NLTK.
     """
 
+    # IDs are matched by strict patterns, so they win over overlapping names
+    priority = 1
+
     def __init__(self):
         """Initialize the ID filter."""
         super().__init__()
-        self._verify_resources()
         self._compile_patterns()
 
-    def _verify_resources(self):
-        """Verify required NLTK resources are available."""
-        required = [
-            ('tokenizers/punkt', 'punkt'),
-            ('taggers/averaged_perceptron_tagger', 'averaged_perceptron_tagger')
-        ]
-        for path, resource in required:
-            try:
-                nltk.data.find(path)
-            except LookupError:
-                print(f"Downloading required resource: {resource}")
-                nltk.download(resource, quiet=True)
-
     def _compile_patterns(self):
         """Compile regex patterns for common ID formats."""
         self.id_patterns = [
@@ -38,6 +32,22 @@ class IdFilter(BaseFilter):
         ]
         self.compiled_patterns = [re.compile(pattern) for pattern in self.id_patterns]
 
+        # Words that mark a nearby token as an ID, and how far to look for them
+        self.id_indicators = {
+            'id', 'number', 'no', 'reference', 'case', '#', 'code',
+            'identifier', 'registration', 'serial', 'account'
+        }
+        self.context_window = 3  # Check 3 tokens before and after
+
+        # One pass over the text finds any indicator; tokens are always
+        # delimited by non-word characters, so this never misses one.
+        words = sorted((w for w in self.id_indicators if w.isalnum()), key=len, reverse=True)
+        symbols = [w for w in self.id_indicators if not w.isalnum()]
+        self.indicator_pattern = re.compile(
+            '|'.join([rf"\b(?:{'|'.join(words)})\b"] + [re.escape(s) for s in symbols]),
+            re.IGNORECASE
+        )
+
     def find(self, text: str) -> List[str]:
         """
         Find IDs in text using NLTK's POS tagging and pattern matching.
@@ -50,31 +60,111 @@ class IdFilter(BaseFilter):
         """
         if not text:
             return []
+        return self.find_in_document(Document.analyze(text))
+
+    def find_in_document(self, document: Document) -> List[str]:
+        """
+        Find IDs in an analyzed document using its POS tags.
+
+        Args:
+            document: Analyzed document to search
+
+        Returns:
+            List of detected IDs
+        """
+        if not document.text:
+            return []
 
         try:
-            # Tokenize and tag the text
-            tokens = nltk.word_tokenize(text)
-            tagged = nltk.pos_tag(tokens)
+            # An ID always has an indicator word within the context window, so
+            # text without any indicator cannot contain one.
+            if not self.indicator_pattern.search(document.text):
+                return []
+
+            tokens = document.tokens
+            indicators = [
+                i for i, token in enumerate(tokens)
+                if token.text.lower() in self.id_indicators
+            ]
+            window = self.context_window
+            candidates = sorted({
+                j for i in indicators
+                for j in range(max(0, i - window), min(len(tokens), i + window + 1))
+            })
+
+            # Sentences are tagged only when a candidate needs its tags. The
+            # faster tiers rely on the patterns and indicator words alone.
+            tagged = document.lazy_tagged if document.tier == 'accurate' else None
 
             ids = []
-            for i, (word, tag) in enumerate(tagged):
+            for i in candidates:
+                word = tokens[i].text
+                # Validate and clean the ID
+                clean_id = self._clean_id(word)
+                if not clean_id or clean_id in ids:
+                    continue
+
                 # Check for numbers and potential IDs
-                if (tag == 'CD' or self._matches_id_pattern(word)) and self._is_id_context(tagged, i):
-                    # Validate and clean the ID
-                    clean_id = self._clean_id(word)
-                    if clean_id and clean_id not in ids:
+                if tagged is None:
+                    if self._matches_id_pattern(word) and self._has_indicator_nearby(tokens, i):
                         ids.append(clean_id)
+                    continue
+                if not (self._matches_id_pattern(word) or tagged[i][1] == 'CD'):
+                    continue
+                if self._has_indicator_nearby(tokens, i) or self._is_id_context(tagged, i):
+                    ids.append(clean_id)
 
             return ids
 
+        except (LookupError, MissingResourceError):
+            # Missing models must not silently disable detection
+            raise
         except Exception as e:
-            print(f"Error in ID detection: {e}")
-            if isinstance(e, LookupError):
-                print("Attempting to download missing NLTK resources...")
-                self._verify_resources()
-                # Retry once after downloading resources
-                return self.find(text)
+            record_error('id', e)
+            return []
+
+    def find_spans(self, document: Document) -> List[Span]:
+        """
+        Find spans of every occurrence of the detected IDs.
+
+        Once an ID is found in an ID context, its other occurrences in the
+        document are reported as well so they are not left in the output.
+
+        Args:
+            document: Analyzed document to search
+
+        Returns:
+            List of spans
+        """
+        ids = set(self.find_in_document(document))
+        if not ids:
             return []
+        return [
+            Span.simple(token.start, token.end, 'id')
+            for token in document.tokens if token.text in ids
+        ]
+
+    def find_known_spans(self, document: Document, builder: 'MappingBuilder') -> List[Span]:
+        """
+        Find spans of IDs detected earlier with the same builder.
+
+        An ID found in an ID context in one segment of a stream or session
+        is masked in later segments as well, as if they were one document.
+
+        Args:
+            document: Analyzed document to search
+            builder: Builder holding the IDs found so far
+
+        Returns:
+            List of spans
+        """
+        known = builder.known_values('id')
+        if not known or not document.text:
+            return []
+        return [
+            Span.simple(token.start, token.end, 'id')
+            for token in document.tokens if (token.text,) in known
+        ]
 
     def _matches_id_pattern(self, text: str) -> bool:
         """Check if text matches any ID pattern."""
@@ -89,7 +179,16 @@ class IdFilter(BaseFilter):
             return id_text  # Return original format if valid
         return ''
 
-    def _is_id_context(self, tagged_tokens: List[tuple], position: int) -> bool:
+    def _has_indicator_nearby(self, tokens: List[Token], position: int) -> bool:
+        """Check for an ID indicator word in the context window, without POS tags."""
+        start = max(0, position - self.context_window)
+        end = min(len(tokens), position + self.context_window + 1)
+        return any(
+            tokens[i].text.lower() in self.id_indicators
+            for i in range(start, end) if i != position
+        )
+
+    def _is_id_context(self, tagged_tokens: Sequence[tuple], position: int) -> bool:
         """
         Check if a token appears in a context that suggests it's an ID.
         Uses surrounding words and their POS tags to make the determination.
@@ -101,13 +200,10 @@ class IdFilter(BaseFilter):
         Returns:
             True if the context suggests an ID, False otherwise
         """
-        id_indicators = {
-            'id', 'number', 'no', 'reference', 'case', '#', 'code',
-            'identifier', 'registration', 'serial', 'account'
-        }
+        id_indicators = self.id_indicators
 
         try:
-            context_window = 3  # Check 3 tokens before and after
+            context_window = self.context_window
             start = max(0, position - context_window)
             end = min(len(tagged_tokens), position + context_window + 1)
 
@@ -132,5 +228,5 @@ class IdFilter(BaseFilter):
             return False
 
         except Exception as e:
-            print(f"Error in ID context detection: {e}")
+            record_error('id_context', e)
             return False
\ No newline at end of file
@@ -1,30 +1,73 @@
-from typing import List, Dict
-import nltk
-import re
-from anonymizer.base import BaseFilter
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
+import functools
+from anonymizer.base import BaseFilter, Span, SpanPart
+from anonymizer.document import Document, Sentence, Token
+from anonymizer.gazetteer import get_gazetteer
+from anonymizer.stats import record_error
+from anonymizer.utils import MissingResourceError
+
+if TYPE_CHECKING:
+    from anonymizer.mapping import MappingBuilder
+
+def name_placeholders(builder: 'MappingBuilder', name: str) -> str:
+    """
+    Replace a text known to be a person's name with name placeholders.
+
+    The first name and the rest of the name get FIRST_NAME and LAST_NAME
+    placeholders like the name filter gives them, so the same person is
+    numbered alike in free text. "Last, First" keeps its order.
+
+    Args:
+        builder: Builder assigning the placeholders
+        name: Whole name, e.g. a display name or a name column value
+
+    Returns:
+        The name with placeholders, or the text itself if it is blank
+    """
+    name = name.strip()
+    if not name:
+        return name
+    last, comma, first = name.partition(',')
+    if comma and first.strip():
+        first, last = first.strip(), last.strip()
+    else:
+        first, _, last = name.partition(' ')
+        last = last.strip()
+
+    if not last:
+        return builder.placeholders('name', ['FIRST_NAME'], (first,))[0]
+    first_placeholder, last_placeholder = builder.placeholders(
+        'name', ['FIRST_NAME', 'LAST_NAME'], (first, last)
+    )
+    if comma:
+        return f"{last_placeholder}, {first_placeholder}"
+    return f"{first_placeholder} {last_placeholder}"
 
 class NameFilter(BaseFilter):
     """Filter for detecting and anonymizing names using NLTK."""
 
-    def __init__(self):
-        """Initialize the name filter with NLTK resources."""
+    # Score of an untitled run without any known first name or surname
+    UNKNOWN_NAME_SCORE = 0.5
+
+    def __init__(self, use_gazetteer: bool = True, skip_sentences: bool = True,
+                 reject_unknown: bool = False):
+        """
+        Initialize the name filter with NLTK resources.
+
+        Args:
+            use_gazetteer: Use the lists of known names to drop leading words
+                of untitled proper noun runs and to score runs
+            skip_sentences: Skip tagging sentences that cannot contain a name
+            reject_unknown: Drop untitled runs without a known first name or
+                surname. The lists hold common names only, so this loses
+                rarer names; requires use_gazetteer.
+        """
         super().__init__()
-        self._verify_resources()
+        self.use_gazetteer = use_gazetteer
+        self.skip_sentences = skip_sentences
+        self.reject_unknown = reject_unknown
         self._init_name_lists()
 
-    def _verify_resources(self):
-        """Verify required NLTK resources are available."""
-        required = [
-            ('tokenizers/punkt', 'punkt'),
-            ('taggers/averaged_perceptron_tagger', 'averaged_perceptron_tagger')
-        ]
-        for path, resource in required:
-            try:
-                nltk.data.find(path)
-            except LookupError:
-                print(f"Downloading required resource: {resource}")
-                nltk.download(resource, quiet=True)
-
     def _init_name_lists(self):
         """Initialize lists of common names and titles."""
         self.honorifics = {
@@ -32,91 +75,235 @@ class NameFilter(BaseFilter):
             'pan', 'pani', 'sir', 'madam', 'lord', 'lady',
             'rev', 'reverend', 'captain', 'major', 'colonel'
         }
+        # Capitalized words often tagged as proper nouns in front of a name
+        self.greetings = {'hi', 'hello', 'hey', 'dear', 'thanks', 'greetings'}
+        self.gazetteer = get_gazetteer()
 
     def find(self, text: str) -> List[Dict[str, str]]:
         """Find names in text using NLTK and additional heuristics."""
         if not text:
             return []
+        return self.find_in_document(Document.analyze(text))
+
+    def find_in_document(self, document: Document) -> List[Dict[str, str]]:
+        """Find names in an analyzed document using its POS tags."""
+        names = []
+        for title, name_parts in self._find_name_runs(document):
+            name_info = self._create_name_info(
+                title.text if title else None,
+                [part.text for part in name_parts]
+            )
+            if name_info:
+                names.append(name_info)
+        return names
+
+    def find_spans(self, document: Document) -> List[Span]:
+        """
+        Find name spans in an analyzed document.
+
+        The first name and the rest of the name are reported as separate
+        FIRST_NAME and LAST_NAME parts; a TITLE part is kept in the text.
+        """
+        spans = []
+        for title, name_parts in self._find_name_runs(document):
+            first = name_parts[0]
+            parts = [SpanPart('FIRST_NAME', first.start, first.end)]
+            if title:
+                parts.insert(0, SpanPart('TITLE', title.start, title.end, replace=False))
+            if len(name_parts) > 1:
+                parts.append(SpanPart('LAST_NAME', name_parts[1].start, name_parts[-1].end))
+            start = title.start if title else first.start
+            score = 1.0 if title else self._score(name_parts)
+            spans.append(Span(start, name_parts[-1].end, 'name', tuple(parts), score))
+        return spans
+
+    def _find_name_runs(self, document: Document) -> List[Tuple[Optional[Token], List[Token]]]:
+        """
+        Find runs of name tokens in a document.
+
+        Returns:
+            List of (title token or None, name part tokens) tuples
+        """
+        if not document.text:
+            return []
 
         try:
-            # Normalize honorifics first
-            normalized_text = self._normalize_honorifics(text)
-
-            # Process text sentence by sentence
-            sentences = nltk.sent_tokenize(normalized_text)
-            names = []
-
-            for sentence in sentences:
-                tokens = nltk.word_tokenize(sentence)
-                tagged = nltk.pos_tag(tokens)
-
-                i = 0
-                while i < len(tagged):
-                    word, tag = tagged[i]
-                    word_lower = word.lower().rstrip('.')
-
-                    # Handle honorifics followed by proper nouns
-                    if word_lower in self.honorifics:
-                        # Normalize title
-                        title = word if word.endswith('.') else (f"{word}." if len(word) <= 3 else word)
-
-                        # Look ahead for name parts
-                        name_parts = []
-                        j = i + 1
-                        while j < len(tagged):
-                            next_word, next_tag = tagged[j]
-                            if next_tag.startswith('NNP') or next_word in ['Jr.', 'Sr.']:
-                                name_parts.append(next_word)
-                                j += 1
-                            else:
-                                break
+            runs = []
+            # Cached per-sentence results depend on the configuration
+            key = ('name', self.use_gazetteer, self.skip_sentences, self.reject_unknown, document.tier)
+            sentence_runs = functools.partial(self._sentence_runs, document.text, document.tier)
+            if document.tier == 'accurate':
+                # Tag the sentences that need it in one batch
+                document.tag_sentences([
+                    sentence for sentence in document.sentences
+                    if not sentence.has_cached(key)
+                    and (not self.skip_sentences or self._may_contain_name(sentence.tokens))
+                ])
+            for sentence in document.sentences:
+                tokens = sentence.tokens
+                for title, start, end in sentence.cached(key, sentence_runs):
+                    runs.append((tokens[title] if title is not None else None, tokens[start:end]))
+            return runs
+
+        except (LookupError, MissingResourceError):
+            # Missing models must not silently disable detection
+            raise
+        except Exception as e:
+            record_error('name', e)
+            return []
+
+    def _sentence_runs(self, text: str, tier: str, sentence: Sentence) -> Tuple[Tuple[Optional[int], int, int], ...]:
+        """
+        Find runs of name tokens in one sentence.
+
+        Positions are relative to the sentence's tokens, so the result can be
+        cached for the sentence text and reused in other documents. The
+        'fast' tier takes capitalized words for proper nouns instead of POS
+        tagging; 'balanced' tags only sentences where that finds a name.
+
+        Returns:
+            (title position or None, first name position, end position) tuples
+        """
+        tokens = sentence.tokens
+        if self.skip_sentences and not self._may_contain_name(tokens):
+            return ()
+        if tier != 'accurate':
+            runs = self._runs(text, tokens, self._capitalization_tags(tokens))
+            if tier == 'fast' or not runs:
+                return runs
+        return self._runs(text, tokens, sentence.tags)
 
+    def _capitalization_tags(self, tokens: List[Token]) -> List[str]:
+        """
+        Stand-in POS tags that mark capitalized words as proper nouns.
+
+        A sentence starts with a capital, so a word at its start or after
+        sentence-ending punctuation only counts if it is a known name or
+        another capitalized word that is not a title follows it.
+        """
+        words = [token.text for token in tokens]
+        tags = [
+            'NNP' if word[:1].isupper() and not word.isupper()
+            and word.replace("'", '').replace('-', '').isalpha() else ''
+            for word in words
+        ]
+        for i, tag in enumerate(tags):
+            if not tag or (i > 0 and words[i - 1] not in ('.', '!', '?')):
+                continue
+            followed = i + 1 < len(tags) and tags[i + 1] and words[i + 1].lower() not in self.honorifics
+            if not followed and not (self.use_gazetteer and self.gazetteer.is_name(words[i])):
+                tags[i] = ''
+        return tags
+
+    def _runs(self, text: str, tokens: List[Token], tags: List[str]) -> Tuple[Tuple[Optional[int], int, int], ...]:
+        """Find runs of name tokens given a tag per token."""
+        runs = []
+        i = 0
+        while i < len(tokens):
+            word, tag = tokens[i].text, tags[i]
+            word_lower = word.lower().rstrip('.')
+
+            # Handle honorifics followed by proper nouns
+            if word_lower in self.honorifics:
+                # Look ahead for name parts, past the period if it is a token of its own
+                start = i + 1
+                if start < len(tokens) and tokens[start].text == '.' and tokens[start].start == tokens[i].end:
+                    start += 1
+                j = self._extend_run(text, tokens, tags, start, i)
+                if j > start:
+                    runs.append((i, start, j))
+                    i = j
+                    continue
+
+            # Handle proper nouns (potential names without titles)
+            elif tag.startswith('NNP'):
+                j = self._extend_run(text, tokens, tags, i, i)
+                if j > i:
+                    # Check if first word is actually a title
+                    first_word = word_lower
+                    if first_word in self.honorifics:
+                        if j > i + 1:
+                            runs.append((i, i + 1, j))
+                    else:
+                        name_parts = self._confirm_name(tokens[i:j])
                         if name_parts:
-                            name_info = self._create_name_info(title, name_parts)
-                            if name_info:
-                                names.append(name_info)
-                            i = j
-                            continue
-
-                    # Handle proper nouns (potential names without titles)
-                    elif tag.startswith('NNP'):
-                        name_parts = []
-                        j = i
-                        while j < len(tagged):
-                            curr_word, curr_tag = tagged[j]
-                            if curr_tag.startswith('NNP') or curr_word in ['Jr.', 'Sr.']:
-                                name_parts.append(curr_word)
-                                j += 1
-                            else:
-                                break
-
-                        if len(name_parts) > 0:
-                            # Check if first word is actually a title
-                            first_word = name_parts[0].lower().rstrip('.')
-                            if first_word in self.honorifics:
-                                title = name_parts[0]
-                                if not title.endswith('.') and len(title) <= 3:
-                                    title = f"{title}."
-                                name_info = self._create_name_info(title, name_parts[1:])
-                            else:
-                                name_info = self._create_name_info(None, name_parts)
-
-                            if name_info:
-                                names.append(name_info)
-                            i = j
-                            continue
-
-                    i += 1
-
-            return names
+                            runs.append((None, j - len(name_parts), j))
+                    i = j
+                    continue
 
-        except Exception as e:
-            print(f"Error in name detection: {str(e)}")
-            if isinstance(e, LookupError):
-                print("Attempting to download missing NLTK resources...")
-                self._verify_resources()
-                return self.find(text)
+            i += 1
+
+        return tuple(runs)
+
+    def _may_contain_name(self, tokens: List[Token]) -> bool:
+        """
+        Cheap check whether a sentence is worth tagging.
+
+        A name needs a capitalized token after the first one, an honorific,
+        or a known first name or surname at the start of the sentence.
+        Without the gazetteer, any capitalized first token is a candidate.
+        """
+        if not tokens:
+            return False
+        if any(token.text[:1].isupper() for token in tokens[1:]):
+            return True
+        if any(token.text.lower().rstrip('.') in self.honorifics for token in tokens):
+            return True
+        if not self.use_gazetteer:
+            return tokens[0].text[:1].isupper()
+        return self.gazetteer.is_name(tokens[0].text)
+
+    def _confirm_name(self, name_parts: List[Token]) -> List[Token]:
+        """
+        Trim an untitled run of proper nouns using the gazetteer.
+
+        Greetings are always dropped from the front. With the gazetteer,
+        leading words before the first known first name are dropped as
+        well, which removes other capitalized words tagged as proper nouns.
+        A run without a known first name is kept whole, unless
+        reject_unknown is set and it has no known surname either.
+
+        Returns:
+            Name parts, or an empty list if the run is rejected
+        """
+        while name_parts and name_parts[0].text.lower() in self.greetings:
+            name_parts = name_parts[1:]
+        if not self.use_gazetteer or not name_parts:
+            return name_parts
+        for k, part in enumerate(name_parts):
+            if self.gazetteer.is_first_name(part.text):
+                return name_parts[k:]
+        if self.reject_unknown and not any(self.gazetteer.is_surname(part.text) for part in name_parts):
             return []
+        return name_parts
+
+    def _score(self, name_parts: List[Token]) -> float:
+        """Score an untitled name: lower if none of its parts is a known name."""
+        if self.use_gazetteer and not any(self.gazetteer.is_name(part.text) for part in name_parts):
+            return self.UNKNOWN_NAME_SCORE
+        return 1.0
+
+    def _extend_run(self, text: str, tokens: List[Token], tags: List[str], j: int, anchor: int) -> int:
+        """
+        Extend a run of proper nouns starting at position j.
+
+        A run stops at the first token that is not a proper noun or suffix,
+        and does not continue onto a new line.
+
+        Returns:
+            Position just past the end of the run
+        """
+        prev = tokens[anchor]
+        while j < len(tokens):
+            token = tokens[j]
+            if j > anchor and '\n' in text[prev.end:token.start]:
+                break
+            if tags[j].startswith('NNP') or token.text in ['Jr.', 'Sr.']:
+                prev = token
+                j += 1
+            else:
+                break
+        return j
 
     def _create_name_info(self, title: str, name_parts: List[str]) -> Dict[str, str]:
         """Create a name info dictionary from name components."""
@@ -160,13 +347,3 @@ class NameFilter(BaseFilter):
             'first': first_name,
             'last': last_name
         }
-
-    def _normalize_honorifics(self, text: str) -> str:
-        """Normalize honorifics to ensure proper detection."""
-        words = text.split()
-        for i, word in enumerate(words):
-            word_lower = word.lower().rstrip('.')
-            if word_lower in self.honorifics:
-                if not word.endswith('.') and len(word) <= 3:
-                    words[i] = f"{word}."
-        return ' '.join(words)
\ No newline at end of file
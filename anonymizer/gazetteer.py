@@ -0,0 +1,84 @@
+"""
+Gazetteer of common first names and surnames used to confirm name candidates.
+"""
+from typing import FrozenSet
+from functools import lru_cache
+from pathlib import Path
+import mmap
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+class Gazetteer:
+    """
+    Case-insensitive lookup of known first names and surnames.
+    """
+
+    __slots__ = ('first_names', 'surnames')
+
+    def __init__(self, first_names: FrozenSet[str], surnames: FrozenSet[str]):
+        """
+        Initialize the gazetteer.
+
+        Args:
+            first_names: Lower-cased first names
+            surnames: Lower-cased surnames
+        """
+        self.first_names = first_names
+        self.surnames = surnames
+
+    @classmethod
+    def from_files(cls, first_names_path: Path, surnames_path: Path) -> 'Gazetteer':
+        """
+        Load a gazetteer from two files with one name per line.
+
+        Args:
+            first_names_path: File of first names
+            surnames_path: File of surnames
+
+        Returns:
+            Loaded gazetteer
+        """
+        return cls(_load_names(first_names_path), _load_names(surnames_path))
+
+    def is_first_name(self, word: str) -> bool:
+        """Check if a word is a known first name."""
+        return _normalize(word) in self.first_names
+
+    def is_surname(self, word: str) -> bool:
+        """Check if a word is a known surname."""
+        return _normalize(word) in self.surnames
+
+    def is_name(self, word: str) -> bool:
+        """Check if a word is a known first name or surname."""
+        word = _normalize(word)
+        return word in self.first_names or word in self.surnames
+
+
+@lru_cache(maxsize=None)
+def get_gazetteer() -> Gazetteer:
+    """
+    Load the bundled gazetteer once per process.
+
+    Returns:
+        Shared Gazetteer instance
+    """
+    return Gazetteer.from_files(DATA_DIR / "first_names.txt", DATA_DIR / "surnames.txt")
+
+
+def _normalize(word: str) -> str:
+    """Normalize a token for lookup."""
+    return word.rstrip('.').lower()
+
+
+def _load_names(path: Path) -> FrozenSet[str]:
+    """Read a name list through a memory map and return its lower-cased entries."""
+    with open(path, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            return frozenset()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return frozenset(
+                line.strip().decode('utf-8').lower()
+                for line in iter(data.readline, b'')
+                if line.strip()
+            )
@@ -0,0 +1,334 @@
+"""
+Anonymization of email messages, .eml files and mbox archives.
+
+Messages are grouped into threads by their References and In-Reply-To
+headers, and all messages of a thread share one mapping, so a person gets
+the same placeholders in every message of a conversation. Bodies are
+split into blocks: unquoted text, quoted replies and signatures. A quoted
+reply is unquoted and split again, so the earlier messages it repeats are
+recognized as blocks that were already anonymized, and each distinct block
+is analyzed only once per thread. On long conversations this cuts the work
+roughly by the depth of the thread.
+
+    mail = MailAnonymizer()
+    for result in mail.anonymize_mbox('archive.mbox'):
+        output.write(result.message.as_bytes(unixfrom=True))
+"""
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+from collections import OrderedDict
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesParser
+from email.utils import formataddr, getaddresses
+from pathlib import Path
+import html
+import mmap
+import re
+from anonymizer.core import Anonymizer
+from anonymizer.filters.name import name_placeholders
+from anonymizer.mapping import PLACEHOLDER_PATTERN, MappingBuilder, SubstitutionMapping
+
+# Headers whose display names are replaced; the addresses are kept
+ADDRESS_HEADERS = ('From', 'To', 'Cc', 'Bcc', 'Reply-To', 'Sender')
+
+# Reply and forward markers in front of a subject
+_SUBJECT_PREFIX = re.compile(r'^(?:\s*(?:re|fwd?|aw|wg)\s*:)*\s*', re.IGNORECASE)
+
+# One level of quoting: '>' and an optional space
+_QUOTE_PREFIX = re.compile(r'> ?')
+
+# Signature delimiter line, "-- " by convention
+_SIGNATURE_DELIMITER = re.compile(r'--[ \t]?\r?\n?\Z')
+
+_parser = BytesParser(policy=policy.default)
+
+
+class AnonymizedMessage(NamedTuple):
+    """An anonymized message with the mapping of its thread."""
+    message: EmailMessage
+    thread: str
+    # Placeholders of the thread so far, enough to restore this message
+    mapping: SubstitutionMapping
+
+
+class _Thread:
+    """Mapping builder and anonymized blocks of one conversation."""
+
+    __slots__ = ('builder', 'blocks')
+
+    def __init__(self, builder: MappingBuilder):
+        self.builder = builder
+        self.blocks: Dict[str, str] = {}
+
+
+def read_eml(path: Union[str, Path]) -> EmailMessage:
+    """
+    Parse an .eml file.
+
+    Args:
+        path: File holding one RFC 5322 message
+
+    Returns:
+        Parsed message
+    """
+    with open(path, 'rb') as source:
+        if source.seek(0, 2) == 0:
+            return _parser.parsebytes(b'')
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return _parser.parsebytes(buffer[:])
+
+
+def read_mbox(path: Union[str, Path]) -> Iterator[EmailMessage]:
+    """
+    Parse the messages of an mbox file one at a time.
+
+    The file is memory-mapped and scanned for "From " separator lines, so
+    only the message being parsed is copied into memory. Like the mailbox
+    module, ">From " lines in bodies are left escaped.
+
+    Args:
+        path: mbox file
+
+    Yields:
+        Parsed messages in file order
+    """
+    with open(path, 'rb') as source:
+        if source.seek(0, 2) == 0:
+            return
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            start = 0 if buffer[:5] == b'From ' else buffer.find(b'\nFrom ')
+            while start != -1:
+                if buffer[start:start + 1] == b'\n':
+                    start += 1
+                # Skip the envelope line
+                body = buffer.find(b'\n', start)
+                if body == -1:
+                    return
+                end = buffer.find(b'\nFrom ', body)
+                message = _parser.parsebytes(buffer[body + 1:end + 1 if end != -1 else len(buffer)])
+                message.set_unixfrom(buffer[start:body].rstrip(b'\r').decode('latin-1'))
+                yield message
+                start = end
+
+
+def _split_blocks(text: str) -> List[Tuple[bool, str]]:
+    """
+    Split a body into runs of quoted and unquoted lines.
+
+    Unquoted runs are also split before a signature delimiter, so a
+    signature is a block of its own.
+
+    Returns:
+        (quoted, text) tuples covering the whole body
+    """
+    blocks: List[Tuple[bool, List[str]]] = []
+    for line in text.splitlines(keepends=True):
+        quoted = line.startswith('>')
+        if blocks and blocks[-1][0] == quoted and (quoted or not _SIGNATURE_DELIMITER.match(line)):
+            blocks[-1][1].append(line)
+        else:
+            blocks.append((quoted, [line]))
+    return [(quoted, ''.join(lines)) for quoted, lines in blocks]
+
+
+class MailAnonymizer:
+    """
+    Anonymizes email messages thread by thread.
+
+    Display names in address headers, subjects and text bodies are
+    anonymized; email addresses and non-text attachments are kept as they
+    are. HTML bodies are anonymized as text, with placeholders escaped.
+    """
+
+    def __init__(self, anonymizer: Optional[Anonymizer] = None, max_threads: int = 1024):
+        """
+        Initialize the mail anonymizer.
+
+        Args:
+            anonymizer: Anonymizer to use; one with all filters if None.
+                With a vault, placeholders are stable across threads too.
+            max_threads: Number of threads whose mappings are kept; a message
+                of an older thread starts a new mapping
+        """
+        self.anonymizer = anonymizer if anonymizer is not None else Anonymizer()
+        self.max_threads = max_threads
+        self._threads: 'OrderedDict[str, _Thread]' = OrderedDict()
+        self._thread_of: Dict[str, str] = {}
+        self._counts = {'messages': 0, 'blocks': 0, 'reused_blocks': 0}
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get counts of processed messages and body blocks.
+
+        Returns:
+            Dictionary with 'messages', 'blocks' (anonymized) and
+            'reused_blocks' (taken from earlier messages of the thread)
+        """
+        return dict(self._counts)
+
+    def anonymize_mbox(self, path: Union[str, Path]) -> Iterator[AnonymizedMessage]:
+        """
+        Anonymize all messages of an mbox file.
+
+        Args:
+            path: mbox file
+
+        Yields:
+            Anonymized messages in file order
+        """
+        for message in read_mbox(path):
+            yield self.anonymize_message(message)
+
+    def anonymize_eml(self, path: Union[str, Path]) -> AnonymizedMessage:
+        """
+        Anonymize the message of an .eml file.
+
+        Args:
+            path: File holding one message
+
+        Returns:
+            Anonymized message
+        """
+        return self.anonymize_message(read_eml(path))
+
+    def anonymize_bytes(self, data: bytes) -> AnonymizedMessage:
+        """
+        Anonymize a raw message.
+
+        Args:
+            data: RFC 5322 message
+
+        Returns:
+            Anonymized message
+        """
+        return self.anonymize_message(_parser.parsebytes(data))
+
+    def anonymize_message(self, message: EmailMessage) -> AnonymizedMessage:
+        """
+        Anonymize a parsed message in place.
+
+        Args:
+            message: Message parsed with email.policy.default
+
+        Returns:
+            The message with its thread id and the thread's mapping
+        """
+        thread_id, thread = self._thread(message)
+
+        for header in ADDRESS_HEADERS:
+            values = message.get_all(header)
+            if values:
+                anonymized = [self._anonymize_addresses(thread, str(value)) for value in values]
+                if len(anonymized) == 1:
+                    # Keeps the header in place
+                    message.replace_header(header, anonymized[0])
+                    continue
+                del message[header]
+                for value in anonymized:
+                    message[header] = value
+
+        subject = message.get('Subject')
+        if subject:
+            subject = str(subject)
+            prefix = _SUBJECT_PREFIX.match(subject).group(0)
+            message.replace_header('Subject', prefix + self._anonymize_block(thread, subject[len(prefix):]))
+
+        for part in message.walk():
+            if part.is_multipart() or part.get_content_maintype() != 'text':
+                continue
+            if part.get_content_disposition() == 'attachment':
+                continue
+            self._anonymize_part(thread, part, is_root=part is message)
+
+        self._counts['messages'] += 1
+        return AnonymizedMessage(message, thread_id, thread.builder.freeze())
+
+    def _thread(self, message: EmailMessage) -> Tuple[str, _Thread]:
+        """Find or start the thread of a message."""
+        message_id = str(message.get('Message-ID', '')).strip()
+        parents = str(message.get('References', '')).split() + str(message.get('In-Reply-To', '')).split()
+        thread_id = None
+        for parent in parents:
+            thread_id = self._thread_of.get(parent)
+            if thread_id is not None:
+                break
+        if thread_id is None:
+            # The oldest reference is the root even if it was never seen
+            thread_id = parents[0] if parents else message_id or f"<message-{self._counts['messages']}>"
+        if message_id:
+            self._thread_of[message_id] = thread_id
+
+        thread = self._threads.get(thread_id)
+        if thread is None:
+            thread = self._threads[thread_id] = _Thread(self.anonymizer._new_builder())
+            if len(self._threads) > self.max_threads:
+                self._threads.popitem(last=False)
+        else:
+            self._threads.move_to_end(thread_id)
+        return thread_id, thread
+
+    def _anonymize_addresses(self, thread: _Thread, value: str) -> str:
+        """Replace the display names of an address header."""
+        addresses = []
+        for name, address in getaddresses([value]):
+            addresses.append(formataddr((self._anonymize_display_name(thread, name), address)))
+        return ', '.join(addresses)
+
+    def _anonymize_display_name(self, thread: _Thread, name: str) -> str:
+        """
+        Replace a display name with name placeholders.
+
+        A display name names a person or an organization, so it is replaced
+        without detection. Placeholders match those the name filter gives
+        the same name in a body.
+        """
+        return name_placeholders(thread.builder, name)
+
+    def _anonymize_part(self, thread: _Thread, part: EmailMessage, is_root: bool):
+        """Anonymize a text part of a message in place."""
+        subtype = part.get_content_subtype()
+        had_version = 'MIME-Version' in part
+        text = part.get_content()
+        if subtype == 'html':
+            # Placeholders would read as tags
+            anonymized = PLACEHOLDER_PATTERN.sub(
+                lambda m: html.escape(m.group(0)), self._anonymize_block(thread, text)
+            )
+        else:
+            anonymized = self._anonymize_text(thread, text)
+        if anonymized == text:
+            return
+        part.set_content(anonymized, subtype=subtype)
+        if not is_root and not had_version:
+            del part['MIME-Version']
+
+    def _anonymize_text(self, thread: _Thread, text: str) -> str:
+        """Anonymize a plain-text body block by block."""
+        pieces = []
+        for quoted, block in _split_blocks(text):
+            if not quoted:
+                pieces.append(self._anonymize_block(thread, block))
+                continue
+
+            # Unquote one level and anonymize the inner text like a body
+            lines = block.splitlines(keepends=True)
+            prefixes = [_QUOTE_PREFIX.match(line).group(0) for line in lines]
+            inner = ''.join(line[len(prefix):] for line, prefix in zip(lines, prefixes))
+            anonymized = self._anonymize_text(thread, inner).splitlines(keepends=True)
+            if len(anonymized) != len(lines):
+                prefixes = [prefixes[0]] * len(anonymized)
+            pieces.extend(prefix + line for prefix, line in zip(prefixes, anonymized))
+        return ''.join(pieces)
+
+    def _anonymize_block(self, thread: _Thread, block: str) -> str:
+        """Anonymize one block, reusing the result for repeated blocks of the thread."""
+        if not block.strip():
+            return block
+        anonymized = thread.blocks.get(block)
+        if anonymized is None:
+            anonymized = self.anonymizer._anonymize(block, thread.builder)
+            thread.blocks[block] = anonymized
+            self._counts['blocks'] += 1
+        else:
+            self._counts['reused_blocks'] += 1
+        return anonymized
@@ -0,0 +1,283 @@
+"""
+Placeholder mappings produced by anonymization.
+"""
+from typing import AbstractSet, Callable, Dict, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+from types import MappingProxyType
+import re
+
+# Matches any placeholder produced by the Anonymizer, e.g. <FIRST_NAME_12>
+PLACEHOLDER_PATTERN = re.compile(r'<[A-Z0-9_]+_\d+>')
+
+# Matches an unfinished placeholder at the end of a text
+PARTIAL_PLACEHOLDER_PATTERN = re.compile(r'<[A-Z0-9_]*\Z')
+
+# Longest unfinished placeholder worth holding back
+MAX_PLACEHOLDER_LENGTH = 64
+
+# Characters of a label that PLACEHOLDER_PATTERN cannot match
+_LABEL_INVALID = re.compile(r'[^A-Z0-9_]')
+
+
+def format_placeholder(label: str, idx: int) -> str:
+    """
+    Render a placeholder so that PLACEHOLDER_PATTERN finds it again.
+
+    The label is uppercased and any other character than A-Z, 0-9 and '_',
+    e.g. the hyphen of a custom filter named 'iban-de', becomes '_'.
+
+    Args:
+        label: Placeholder label or entity type
+        idx: Entity number
+
+    Returns:
+        Placeholder such as <IBAN_DE_1>
+    """
+    return f"<{_LABEL_INVALID.sub('_', label.upper())}_{idx}>"
+
+
+class SubstitutionMapping(Mapping[str, str]):
+    """
+    Immutable mapping from placeholders to the original values they replaced.
+
+    A mapping is returned together with each anonymized text and can be shared
+    freely between threads or pickled to another process.
+    """
+
+    __slots__ = ('_substitutions', '_reverse', '_restorer', '_prefixes')
+
+    def __init__(self, substitutions: Optional[Dict[str, str]] = None,
+                 reverse: Optional[Dict[str, str]] = None):
+        """
+        Initialize the mapping.
+
+        Args:
+            substitutions: Placeholder to original value
+            reverse: Original text to the placeholder text that replaced it
+        """
+        self._substitutions = dict(substitutions or {})
+        self._reverse = dict(reverse or {})
+        self._restorer: Optional[Callable[[str], str]] = None
+        self._prefixes: Optional[FrozenSet[str]] = None
+
+    def __getitem__(self, placeholder: str) -> str:
+        return self._substitutions[placeholder]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._substitutions)
+
+    def __len__(self) -> int:
+        return len(self._substitutions)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._substitutions!r})"
+
+    def __reduce__(self):
+        return (type(self), (self._substitutions, self._reverse))
+
+    @property
+    def reverse(self) -> Mapping[str, str]:
+        """Read-only view from original text to placeholder text."""
+        return MappingProxyType(self._reverse)
+
+    def restore(self, text: str) -> str:
+        """
+        Replace all placeholders of this mapping in the text with their values.
+
+        The text is scanned once for anything shaped like a placeholder and each
+        hit is looked up in the mapping, so the cost does not depend on the
+        number of substitutions. Unknown placeholders are left untouched.
+
+        Args:
+            text: Text containing placeholders
+
+        Returns:
+            Text with the original values restored
+        """
+        if not text:
+            return text
+        if self._restorer is None:
+            substitutions = self._substitutions
+
+            def lookup(match: 're.Match') -> str:
+                placeholder = match.group(0)
+                return substitutions.get(placeholder, placeholder)
+
+            self._restorer = lambda value: PLACEHOLDER_PATTERN.sub(lookup, value)
+        return self._restorer(text)
+
+    def is_placeholder_prefix(self, text: str) -> bool:
+        """
+        Check if text is the beginning of one of this mapping's placeholders.
+
+        Args:
+            text: Candidate prefix, starting with '<'
+
+        Returns:
+            True if more input could complete it into a known placeholder
+        """
+        if self._prefixes is None:
+            self._prefixes = frozenset(
+                placeholder[:i] for placeholder in self._substitutions
+                for i in range(1, len(placeholder))
+            )
+        return text in self._prefixes
+
+    def stream_restorer(self) -> 'StreamingRestorer':
+        """
+        Get an incremental restorer for text that arrives in pieces.
+
+        Returns:
+            StreamingRestorer bound to this mapping
+        """
+        return StreamingRestorer(self)
+
+
+class MappingBuilder:
+    """
+    Assigns numbered placeholders to entities while a mapping is being built.
+
+    Each distinct entity of a filter gets the next number in order of first
+    appearance; repeated occurrences reuse the same placeholders.
+    """
+
+    def __init__(self):
+        """Initialize an empty builder."""
+        self._counters: Dict[str, int] = {}
+        self._entities: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+        self._substitutions: Dict[str, str] = {}
+        self._reverse: Dict[str, str] = {}
+        self._known: Dict[str, Set[Tuple[str, ...]]] = {}
+        self._added: List[str] = []
+
+    def known_values(self, filter_name: str) -> AbstractSet[Tuple[str, ...]]:
+        """
+        Get the values of the entities of one type that have placeholders.
+
+        Args:
+            filter_name: Entity type
+
+        Returns:
+            Values tuples, one per entity
+        """
+        return self._known.get(filter_name, frozenset())
+
+    def added_values(self, since: int = 0) -> List[str]:
+        """
+        Get the original texts of entities in the order they got placeholders.
+
+        Args:
+            since: Number of entities to skip, e.g. those seen by an earlier call
+
+        Returns:
+            Texts of the entities added after the first since ones
+        """
+        return self._added[since:]
+
+    def reserve(self, entities: Iterable[Tuple[str, Sequence[Optional[str]], Tuple[str, ...]]]):
+        """
+        Hook called with all entities of a document before placeholders are requested.
+
+        Numbers are assigned on first use here, so there is nothing to do;
+        builders backed by external storage use it to batch their lookups.
+
+        Args:
+            entities: (filter_name, labels, values) tuples
+        """
+
+    def placeholders(self, filter_name: str, labels: Sequence[Optional[str]],
+                     values: Tuple[str, ...]) -> List[str]:
+        """
+        Get the placeholders for one occurrence of an entity.
+
+        Args:
+            filter_name: Entity type, normally the name of the filter that detected it
+            labels: Placeholder label per part; None uses the filter name
+            values: Original text per part
+
+        Returns:
+            One placeholder per part
+        """
+        key = (filter_name, values)
+        idx = self._entities.get(key)
+        if idx is None:
+            idx = self._counters.get(filter_name, 0) + 1
+            self._counters[filter_name] = idx
+            self._entities[key] = idx
+            self._known.setdefault(filter_name, set()).add(values)
+            self._added.append(' '.join(values))
+
+        placeholders = []
+        for label, value in zip(labels, values):
+            placeholder = format_placeholder(label or filter_name, idx)
+            self._substitutions[placeholder] = value
+            placeholders.append(placeholder)
+        self._reverse[' '.join(values)] = ' '.join(placeholders)
+        return placeholders
+
+    def freeze(self) -> SubstitutionMapping:
+        """
+        Get an immutable snapshot of the mapping built so far.
+
+        Returns:
+            SubstitutionMapping with all assigned placeholders
+        """
+        return SubstitutionMapping(self._substitutions, self._reverse)
+
+
+class StreamingRestorer:
+    """
+    Restores placeholders in text that arrives in pieces, such as LLM token deltas.
+
+    Every character that cannot be part of a placeholder is emitted as soon as
+    it arrives. Only the shortest suffix that could still grow into a
+    placeholder is held back until the next delta decides it.
+    """
+
+    def __init__(self, mapping):
+        """
+        Initialize the restorer.
+
+        Args:
+            mapping: SubstitutionMapping, or any object with a restore(text) method
+                such as a PseudonymVault
+        """
+        self._mapping = mapping
+        self._pending = ''
+
+    def feed(self, delta: str) -> str:
+        """
+        Add the next piece of text.
+
+        Args:
+            delta: Newly arrived text
+
+        Returns:
+            Restored text that can be emitted now
+        """
+        text = self._pending + delta
+        hold = self._ambiguous_suffix_start(text)
+        self._pending = text[hold:]
+        return self._mapping.restore(text[:hold])
+
+    def flush(self) -> str:
+        """
+        Signal the end of the stream.
+
+        Returns:
+            Any text still held back
+        """
+        text, self._pending = self._pending, ''
+        return self._mapping.restore(text)
+
+    def _ambiguous_suffix_start(self, text: str) -> int:
+        """Find where the suffix that may still become a placeholder starts."""
+        start = text.rfind('<')
+        if start < 0 or len(text) - start > MAX_PLACEHOLDER_LENGTH:
+            return len(text)
+        suffix = text[start:]
+        is_prefix = getattr(self._mapping, 'is_placeholder_prefix', None)
+        if is_prefix is not None:
+            possible = is_prefix(suffix)
+        else:
+            possible = PARTIAL_PLACEHOLDER_PATTERN.match(suffix) is not None
+        return start if possible else len(text)
@@ -0,0 +1,315 @@
+"""
+Compact binary format for substitution mappings.
+
+Layout, version 1 (all integers are unsigned LEB128 varints):
+
+    b'AMAP' version
+    string count, then per string: byte length, UTF-8 bytes
+    entry count, then per entry: label string index, number, value string index
+
+Labels (entity types such as FIRST_NAME) and values share one deduplicated
+string table, so each label is stored once however many entries use it.
+Entries are sorted by label and number. A mapping is rebuilt from its
+entries as <LABEL_number> -> value.
+"""
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple, Union
+import bisect
+import re
+import threading
+from anonymizer.mapping import StreamingRestorer, SubstitutionMapping
+
+MAGIC = b'AMAP'
+VERSION = 1
+
+_PLACEHOLDER_PARTS = re.compile(r'<([A-Z0-9_]+)_(\d+)>')
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def _write_varint(out: bytearray, value: int):
+    """Append an unsigned LEB128 varint."""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf: Buffer, pos: int) -> Tuple[int, int]:
+    """Read an unsigned LEB128 varint, returning the value and the next position."""
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def pack_mapping(mapping: Mapping[str, str]) -> bytes:
+    """
+    Serialize a mapping into the binary format.
+
+    Args:
+        mapping: Placeholder to original value, e.g. a SubstitutionMapping
+
+    Returns:
+        Encoded mapping
+
+    Raises:
+        ValueError: If a key is not a placeholder
+    """
+    strings: Dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        idx = strings.get(text)
+        if idx is None:
+            idx = strings[text] = len(strings)
+        return idx
+
+    entries = []
+    for placeholder, value in mapping.items():
+        match = _PLACEHOLDER_PARTS.fullmatch(placeholder)
+        if match is None:
+            raise ValueError(f"Not a placeholder: {placeholder!r}")
+        label, number = match.groups()
+        entries.append((label, int(number), value))
+    entries.sort(key=lambda e: (e[0], e[1]))
+    entries = [(intern(label), number, intern(value)) for label, number, value in entries]
+
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    _write_varint(out, len(strings))
+    for text in strings:
+        data = text.encode('utf-8')
+        _write_varint(out, len(data))
+        out += data
+    _write_varint(out, len(entries))
+    for label_idx, number, value_idx in entries:
+        _write_varint(out, label_idx)
+        _write_varint(out, number)
+        _write_varint(out, value_idx)
+    return bytes(out)
+
+
+class PackedMapping(Mapping[str, str]):
+    """
+    Read-only mapping over an encoded buffer.
+
+    Loading checks only the header. The first lookup records string offsets
+    and entry numbers; values are decoded only when their placeholder is
+    looked up, so a mapping read from an mmap is neither copied nor turned
+    into a dict of strings, and text without placeholders costs no parsing. It supports
+    restore() and streaming restoration like SubstitutionMapping. The
+    reverse mapping is not stored.
+    """
+
+    def __init__(self, buffer: Buffer, offset: int = 0):
+        """
+        Load a mapping.
+
+        Only the header is checked here; the index is built on first use.
+
+        Args:
+            buffer: bytes, bytearray, memoryview or mmap holding the mapping
+            offset: Position of the mapping in the buffer
+
+        Raises:
+            ValueError: If the buffer does not hold a supported mapping
+        """
+        buf = buffer if isinstance(buffer, bytes) else memoryview(buffer).cast('B')
+        if bytes(buf[offset:offset + 4]) != MAGIC:
+            raise ValueError("Not a packed substitution mapping")
+        if buf[offset + 4] != VERSION:
+            raise ValueError(f"Unsupported mapping format version {buf[offset + 4]}")
+        self._buf = buf
+        self._offset = offset
+        self._starts: Optional[List[int]] = None
+        self._ends: List[int] = []
+        self._entries: Dict[int, Tuple[List[int], List[int]]] = {}
+        self._labels: Dict[str, int] = {}
+        self._length = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _index(self):
+        """Record string offsets and per-label entries, once even if called from several threads."""
+        with self._lock:
+            if self._starts is None:
+                self._build_index()
+
+    def _build_index(self):
+        """Parse the string table and entries; _starts is set last, once everything is ready."""
+        buf = self._buf
+        pos = self._offset + 5
+
+        count, pos = _read_varint(buf, pos)
+        starts = []
+        ends = []
+        for _ in range(count):
+            length = buf[pos]
+            if length < 0x80:
+                pos += 1
+            else:
+                length, pos = _read_varint(buf, pos)
+            starts.append(pos)
+            pos += length
+            ends.append(pos)
+
+        count, pos = _read_varint(buf, pos)
+        # Per label string index: sorted numbers and the value index of each
+        entries: Dict[int, Tuple[List[int], List[int]]] = {}
+        for _ in range(count):
+            # Single-byte varints are by far the most common; decode them inline
+            label_idx = buf[pos]
+            if label_idx < 0x80:
+                pos += 1
+            else:
+                label_idx, pos = _read_varint(buf, pos)
+            number = buf[pos]
+            if number < 0x80:
+                pos += 1
+            else:
+                number, pos = _read_varint(buf, pos)
+            value_idx = buf[pos]
+            if value_idx < 0x80:
+                pos += 1
+            else:
+                value_idx, pos = _read_varint(buf, pos)
+            entry = entries.get(label_idx)
+            if entry is None:
+                entry = entries[label_idx] = ([], [])
+            entry[0].append(number)
+            entry[1].append(value_idx)
+
+        self._ends = ends
+        self._entries = entries
+        self._labels = {str(buf[starts[idx]:ends[idx]], 'utf-8'): idx for idx in entries}
+        self._length = count
+        self._size = pos - self._offset
+        self._starts = starts
+
+    @property
+    def size(self) -> int:
+        """Number of bytes the encoded mapping takes in the buffer."""
+        if self._starts is None:
+            self._index()
+        return self._size
+
+    @classmethod
+    def iter_buffer(cls, buffer: Buffer) -> Iterator['PackedMapping']:
+        """
+        Load consecutive mappings, e.g. a file of pack_mapping outputs.
+
+        Args:
+            buffer: Buffer holding the mappings back to back
+
+        Yields:
+            One PackedMapping per encoded mapping
+        """
+        offset = 0
+        total = len(buffer if isinstance(buffer, bytes) else memoryview(buffer).cast('B'))
+        while offset < total:
+            mapping = cls(buffer, offset)
+            offset += mapping.size
+            yield mapping
+
+    def _string(self, idx: int) -> str:
+        return str(self._buf[self._starts[idx]:self._ends[idx]], 'utf-8')
+
+    def _lookup(self, label: str, number: int) -> Optional[str]:
+        if self._starts is None:
+            self._index()
+        label_idx = self._labels.get(label)
+        if label_idx is None:
+            return None
+        numbers, values = self._entries[label_idx]
+        pos = bisect.bisect_left(numbers, number)
+        if pos == len(numbers) or numbers[pos] != number:
+            return None
+        return self._string(values[pos])
+
+    def __getitem__(self, placeholder: str) -> str:
+        match = _PLACEHOLDER_PARTS.fullmatch(placeholder)
+        value = self._lookup(match.group(1), int(match.group(2))) if match else None
+        if value is None:
+            raise KeyError(placeholder)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        if self._starts is None:
+            self._index()
+        for label, label_idx in self._labels.items():
+            for number in self._entries[label_idx][0]:
+                yield f"<{label}_{number}>"
+
+    def __len__(self) -> int:
+        if self._starts is None:
+            self._index()
+        return self._length
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({len(self)} placeholders)"
+
+    def restore(self, text: str) -> str:
+        """
+        Replace all placeholders of this mapping in the text with their values.
+
+        Args:
+            text: Text containing placeholders
+
+        Returns:
+            Text with the original values restored
+        """
+        if not text:
+            return text
+
+        def lookup(match: 're.Match') -> str:
+            value = self._lookup(match.group(1), int(match.group(2)))
+            return match.group(0) if value is None else value
+
+        # Matches exactly what PLACEHOLDER_PATTERN matches, split into label and number
+        return _PLACEHOLDER_PARTS.sub(lookup, text)
+
+    def is_placeholder_prefix(self, text: str) -> bool:
+        """
+        Check if text is the beginning of one of this mapping's placeholders.
+
+        Args:
+            text: Candidate prefix, starting with '<'
+
+        Returns:
+            True if more input could complete it into a known placeholder
+        """
+        if self._starts is None:
+            self._index()
+        for label, label_idx in self._labels.items():
+            head = f"<{label}_"
+            if head.startswith(text):
+                return True
+            if text.startswith(head):
+                digits = text[len(head):]
+                if digits.isdigit() and any(
+                    str(number).startswith(digits) for number in self._entries[label_idx][0]
+                ):
+                    return True
+        return False
+
+    def stream_restorer(self) -> StreamingRestorer:
+        """
+        Get an incremental restorer for text that arrives in pieces.
+
+        Returns:
+            StreamingRestorer bound to this mapping
+        """
+        return StreamingRestorer(self)
+
+    def unpack(self) -> SubstitutionMapping:
+        """
+        Decode into a regular SubstitutionMapping.
+
+        Returns:
+            SubstitutionMapping with the same placeholders and an empty reverse mapping
+        """
+        return SubstitutionMapping(dict(self.items()))
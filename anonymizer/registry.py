@@ -0,0 +1,162 @@
+"""
+Registry of available filters.
+
+Filters are declared by name and import path, so listing or selecting them
+imports nothing. A filter's module is imported and the filter is built the
+first time it is used; the instance is then shared by every Anonymizer in
+the process.
+
+Other packages can provide filters through the 'anonymizer.filters' entry
+point group, e.g. in their pyproject.toml:
+
+    [project.entry-points."anonymizer.filters"]
+    iban = "my_package.filters:IbanFilter"
+"""
+from typing import Callable, Dict, Iterator, List, MutableMapping, Optional, Union
+from importlib.metadata import entry_points
+import pkgutil
+import threading
+from anonymizer.base import BaseFilter
+
+ENTRY_POINT_GROUP = 'anonymizer.filters'
+
+# Built-in filters: name -> 'module:attribute' of the filter class
+BUILTIN_FILTERS = {
+    'id': 'anonymizer.filters.id:IdFilter',
+    'name': 'anonymizer.filters.name:NameFilter',
+}
+
+# A filter class or factory, or the import path of one
+FilterFactory = Union[str, Callable[[], BaseFilter]]
+
+_registry: Dict[str, FilterFactory] = dict(BUILTIN_FILTERS)
+_entry_points_loaded = False
+_instances: Dict[str, BaseFilter] = {}
+_lock = threading.RLock()
+
+
+def _load_entry_points():
+    """Add filters declared by installed packages, without importing them."""
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    with _lock:
+        if _entry_points_loaded:
+            return
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            # Explicit registrations and built-ins take precedence
+            _registry.setdefault(entry_point.name.lower(), entry_point.value)
+        _entry_points_loaded = True
+
+
+def register_filter(name: str, factory: FilterFactory):
+    """
+    Register a filter under a name, replacing any filter of that name.
+
+    Args:
+        name: Filter name, as passed to Anonymizer(filters=[...])
+        factory: Filter class, a callable returning a filter, or its
+            import path as 'module:attribute'
+    """
+    name = name.lower()
+    with _lock:
+        _registry[name] = factory
+        _instances.pop(name, None)
+
+
+def available_filters() -> List[str]:
+    """
+    List the names of all registered filters without importing them.
+
+    Returns:
+        Filter names, built-ins first
+    """
+    _load_entry_points()
+    return list(_registry)
+
+
+def get_filter(name: str) -> BaseFilter:
+    """
+    Get the shared instance of a filter, building it on first use.
+
+    Args:
+        name: Registered filter name
+
+    Returns:
+        Filter instance shared across the process
+
+    Raises:
+        KeyError: If no filter is registered under the name
+    """
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+
+    _load_entry_points()
+    with _lock:
+        instance = _instances.get(name)
+        if instance is None:
+            factory = _registry[name]
+            if isinstance(factory, str):
+                factory = pkgutil.resolve_name(factory)
+            instance = factory()
+            if not isinstance(instance, BaseFilter):
+                raise TypeError(f"Filter {name!r} is not a BaseFilter: {instance!r}")
+            _instances[name] = instance
+    return instance
+
+
+def clear_filter_cache():
+    """Drop the shared filter instances, e.g. after changing gazetteers or models."""
+    with _lock:
+        _instances.clear()
+
+
+class FilterSet(MutableMapping[str, BaseFilter]):
+    """
+    Filters selected by an Anonymizer, built on first access.
+
+    Looking up names, counting and membership tests do not build filters.
+    Filters assigned to the set are used only by its owner; the others are
+    the shared instances from get_filter().
+    """
+
+    def __init__(self, names: Optional[List[str]] = None):
+        """
+        Select filters.
+
+        Args:
+            names: Filter names, case-insensitive; all registered filters if
+                None. Unknown names are ignored.
+        """
+        available = available_filters()
+        if names is None:
+            selected = available
+        else:
+            wanted = {name.lower() for name in names}
+            selected = [name for name in available if name in wanted]
+        self._filters: Dict[str, Optional[BaseFilter]] = dict.fromkeys(selected)
+
+    def __getitem__(self, name: str) -> BaseFilter:
+        instance = self._filters[name]
+        if instance is None:
+            instance = get_filter(name)
+        return instance
+
+    def __setitem__(self, name: str, instance: BaseFilter):
+        self._filters[name] = instance
+
+    def __delitem__(self, name: str):
+        del self._filters[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._filters
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._filters)
+
+    def __len__(self) -> int:
+        return len(self._filters)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self._filters)})"
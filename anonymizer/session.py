@@ -0,0 +1,220 @@
+"""
+Incremental anonymization of a document that grows or changes over time.
+"""
+from typing import Dict, List, Set, TYPE_CHECKING
+import re
+from anonymizer.document import Document
+from anonymizer.mapping import SubstitutionMapping
+
+if TYPE_CHECKING:
+    from anonymizer.core import Anonymizer
+
+# Words under which units are indexed
+_WORD = re.compile(r'\w+')
+
+
+class _Unit:
+    """A sentence with the whitespace after it, its anonymized text and its words."""
+
+    __slots__ = ('source', 'output', 'words')
+
+    def __init__(self, source: str, output: str):
+        self.source = source
+        self.output = output
+        self.words: Set[str] = set()
+
+
+class AnonymizationSession:
+    """
+    Keeps a document anonymized while text is appended or edited.
+
+    The document is held as units: a sentence with the whitespace after it,
+    and its anonymized text. append() analyzes only the new text; update()
+    finds the units an edit touched and re-analyzes those and their two
+    neighbours, whose sentence boundaries may have moved. The cost of a
+    change therefore depends on its size, not on the length of the document.
+
+    All units share one mapping builder, so an entity keeps its placeholders
+    for the whole session, and a new entity gets the next number even when
+    it is inserted before older ones. Placeholders of deleted text stay in
+    the mapping. An ID is recognized by indicator words in its own
+    sentence; once found, its other occurrences are masked in every unit,
+    as hide_personal_data does for a whole document. Units are indexed by
+    the words of their anonymized text, so only the units that still show
+    a new value are analyzed again.
+
+    Not safe to share between threads.
+    """
+
+    def __init__(self, anonymizer: 'Anonymizer', text: str = ''):
+        """
+        Initialize the session.
+
+        Args:
+            anonymizer: Anonymizer whose filters and settings are used
+            text: Initial document text
+        """
+        self._anonymizer = anonymizer
+        self._builder = anonymizer._new_builder()
+        self._units: List[_Unit] = []
+        # Units by the words of their anonymized text
+        self._index: Dict[str, Set[_Unit]] = {}
+        # Number of builder entities already checked against the units
+        self._seen = 0
+        # Number of units anonymized so far
+        self.reanalyzed = 0
+        if text:
+            self.append(text)
+
+    @property
+    def text(self) -> str:
+        """Current document text."""
+        return ''.join(unit.source for unit in self._units)
+
+    @property
+    def anonymized(self) -> str:
+        """Anonymized document text."""
+        return ''.join(unit.output for unit in self._units)
+
+    @property
+    def mapping(self) -> SubstitutionMapping:
+        """Mapping of all placeholders assigned in this session."""
+        return self._builder.freeze()
+
+    def append(self, text: str) -> str:
+        """
+        Add text to the end of the document.
+
+        The text is analyzed on its own, like a new message in a
+        conversation; a sentence is not continued across appends.
+
+        Args:
+            text: Text to append
+
+        Returns:
+            Anonymized version of the appended text
+        """
+        units = self._analyze(text)
+        self._units.extend(units)
+        self._mask_new_values()
+        return ''.join(unit.output for unit in units)
+
+    def update(self, text: str) -> str:
+        """
+        Replace the document with an edited version of it.
+
+        Args:
+            text: New full text of the document
+
+        Returns:
+            Anonymized new text
+        """
+        units = self._units
+
+        # Units before the first change
+        first = 0
+        start = 0
+        while first < len(units) and text.startswith(units[first].source, start):
+            start += len(units[first].source)
+            first += 1
+
+        # Units after the last change, not overlapping the unchanged prefix
+        last = len(units)
+        end = len(text)
+        while last > first and end - len(units[last - 1].source) >= start \
+                and text.startswith(units[last - 1].source, end - len(units[last - 1].source)):
+            last -= 1
+            end -= len(units[last].source)
+
+        if first == len(units) and last == len(units) and start == end:
+            return self.anonymized
+
+        # Sentence boundaries next to the change may move, so redo the neighbours too
+        if first > 0:
+            first -= 1
+            start -= len(units[first].source)
+        if last < len(units):
+            end += len(units[last].source)
+            last += 1
+
+        for unit in units[first:last]:
+            self._unindex(unit)
+        units[first:last] = self._analyze(text[start:end])
+        self._mask_new_values()
+        return self.anonymized
+
+    def _mask_new_values(self):
+        """
+        Re-analyze the units that still show a value which got a
+        placeholder since the last check, such as an ID repeated before or
+        after the sentence that identified it.
+        """
+        while True:
+            values = self._builder.added_values(self._seen)
+            if not values:
+                return
+            self._seen += len(values)
+
+            stale: Dict[_Unit, None] = {}
+            for value in values:
+                words = _WORD.findall(value)
+                if not words:
+                    continue
+                # The longest word is in the fewest units
+                for unit in self._index.get(max(words, key=len), ()):
+                    if value in unit.output:
+                        stale[unit] = None
+            for unit in stale:
+                self._unindex(unit)
+                unit.output = self._anonymizer._anonymize(unit.source, self._builder)
+                self.reanalyzed += 1
+                self._reindex(unit)
+
+    def _analyze(self, text: str) -> List[_Unit]:
+        """
+        Split text into units and anonymize each of them.
+
+        Returns:
+            Indexed units
+        """
+        if not text:
+            return []
+        anonymizer = self._anonymizer
+        document = Document.analyze(text, cache=anonymizer.sentence_cache, tier=anonymizer.tier)
+
+        # Each unit runs from the start of a sentence to the start of the next
+        cuts = [sentence.start for sentence in document.sentences[1:]]
+        bounds = [0] + cuts + [len(text)]
+        sources = [text[a:b] for a, b in zip(bounds, bounds[1:]) if b > a]
+
+        units = []
+        for source in sources:
+            if source.strip():
+                unit = _Unit(source, anonymizer._anonymize(source, self._builder))
+                self.reanalyzed += 1
+                self._reindex(unit)
+            else:
+                unit = _Unit(source, source)
+            units.append(unit)
+        return units
+
+    def _reindex(self, unit: _Unit):
+        """Index a unit under the words of its anonymized text."""
+        unit.words = set(_WORD.findall(unit.output))
+        index = self._index
+        for word in unit.words:
+            units = index.get(word)
+            if units is None:
+                units = index[word] = set()
+            units.add(unit)
+
+    def _unindex(self, unit: _Unit):
+        """Remove a unit from the index."""
+        index = self._index
+        for word in unit.words:
+            units = index.get(word)
+            if units is not None:
+                units.discard(unit)
+                if not units:
+                    del index[word]
+        unit.words = set()
@@ -0,0 +1,123 @@
+"""
+Optional instrumentation of the anonymization hot path.
+"""
+from typing import Callable, Dict, Optional
+from collections import Counter
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger('anonymizer')
+
+# Upper bounds of the document size histogram buckets, in characters
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2)
+SIZE_LABELS = ('<1KB', '<10KB', '<100KB', '<1MB', '>=1MB')
+
+# Errors swallowed by filters and grammar correction, counted per source
+_errors: Counter = Counter()
+_errors_lock = threading.Lock()
+
+
+def record_error(source: str, error: Exception):
+    """
+    Count an error that was handled on the hot path instead of raised.
+
+    The traceback is logged at debug level so it is available when needed
+    without writing to stdout for every document.
+
+    Args:
+        source: Where the error happened, e.g. 'name' or 'grammar'
+        error: The handled exception
+    """
+    with _errors_lock:
+        _errors[source] += 1
+    logger.debug("Error in %s: %s", source, error, exc_info=error)
+
+
+def error_counts() -> Dict[str, int]:
+    """
+    Get the number of handled errors per source in this process.
+
+    Returns:
+        Error count per source
+    """
+    with _errors_lock:
+        return dict(_errors)
+
+
+class Stats:
+    """
+    Thread-safe accumulator of per-document measurements.
+
+    Each anonymization call collects its timings and match counts locally and
+    records them here with a single lock acquisition.
+    """
+
+    def __init__(self, callback: Optional[Callable[[dict], None]] = None):
+        """
+        Initialize empty statistics.
+
+        Args:
+            callback: Called with the measurements of every document, e.g. to
+                feed a metrics system
+        """
+        self.callback = callback
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Discard everything recorded so far."""
+        with self._lock:
+            self._documents = 0
+            self._characters = 0
+            self._stages: Dict[str, list] = {}
+            self._matches: Counter = Counter()
+            self._sizes = [0] * len(SIZE_LABELS)
+
+    def record(self, size: int, timings: Dict[str, float], matches: Dict[str, int]):
+        """
+        Record the measurements of one document.
+
+        Args:
+            size: Document length in characters
+            timings: Seconds spent per stage
+            matches: Number of accepted spans per filter
+        """
+        with self._lock:
+            self._documents += 1
+            self._characters += size
+            self._sizes[bisect.bisect_right(SIZE_BUCKETS, size)] += 1
+            for stage, seconds in timings.items():
+                entry = self._stages.get(stage)
+                if entry is None:
+                    self._stages[stage] = [1, seconds, seconds]
+                else:
+                    entry[0] += 1
+                    entry[1] += seconds
+                    if seconds > entry[2]:
+                        entry[2] = seconds
+            self._matches.update(matches)
+
+        if self.callback is not None:
+            self.callback({'size': size, 'timings': timings, 'matches': matches})
+
+    def snapshot(self) -> dict:
+        """
+        Get a copy of the statistics.
+
+        Returns:
+            Dictionary with document and character counts, per-stage timers
+            (count, total and max seconds), matches per filter and the
+            document size histogram
+        """
+        with self._lock:
+            return {
+                'documents': self._documents,
+                'characters': self._characters,
+                'stages': {
+                    stage: {'count': count, 'total': total, 'mean': total / count, 'max': peak}
+                    for stage, (count, total, peak) in self._stages.items()
+                },
+                'matches': dict(self._matches),
+                'sizes': dict(zip(SIZE_LABELS, self._sizes)),
+            }
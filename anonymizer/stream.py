@@ -0,0 +1,109 @@
+"""
+Streaming anonymization of inputs too large to hold in memory.
+"""
+from typing import Iterable, Iterator, TextIO, Union, TYPE_CHECKING
+from anonymizer.document import SentenceCache
+from anonymizer.mapping import SubstitutionMapping
+from anonymizer.utils import get_sentence_tokenizer
+
+if TYPE_CHECKING:
+    from anonymizer.core import Anonymizer
+
+
+class AnonymizingStream:
+    """
+    Iterator over anonymized chunks of a text stream.
+
+    Incoming chunks are buffered until at least segment_size characters are
+    available. Everything up to the start of the last sentence in the buffer is
+    then anonymized and emitted, and the last, possibly incomplete, sentence is
+    carried over to the next segment. Names and IDs that straddle a chunk edge
+    are therefore still seen whole, while memory stays bounded by the segment
+    size. All segments share one mapping, so placeholder numbering is
+    consistent across the whole stream, and an ID found in one segment is
+    also masked where a later segment repeats it. Segments already emitted
+    are not revisited.
+
+    Sentences are cached in a small cache of the stream's own, bounded by
+    the segment size, so a long stream does not fill the anonymizer's cache
+    with sentences that are seen once.
+    """
+
+    def __init__(self, anonymizer: 'Anonymizer', source: Union[Iterable[str], TextIO],
+                 segment_size: int = 65536):
+        """
+        Initialize the stream.
+
+        Args:
+            anonymizer: Anonymizer used for each segment
+            source: Iterable of text chunks or a text file object
+            segment_size: Number of characters to collect before anonymizing
+        """
+        self._anonymizer = anonymizer
+        self._source = source
+        self._segment_size = segment_size
+        self._builder = anonymizer._new_builder()
+        self._cache = SentenceCache(256, max_chars=segment_size)
+
+    @property
+    def mapping(self) -> SubstitutionMapping:
+        """Mapping of all placeholders emitted so far."""
+        return self._builder.freeze()
+
+    def __iter__(self) -> Iterator[str]:
+        pending = []
+        pending_size = 0
+        threshold = self._segment_size
+        for chunk in self._chunks():
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size < threshold:
+                continue
+
+            buffer = ''.join(pending)
+            cut = self._find_cut(buffer)
+            if cut:
+                yield self._anonymize(buffer[:cut])
+                buffer = buffer[cut:]
+                threshold = self._segment_size
+            else:
+                # Wait for another full segment before splitting again
+                threshold = len(buffer) + self._segment_size
+            pending = [buffer]
+            pending_size = len(buffer)
+
+        buffer = ''.join(pending)
+        if buffer:
+            yield self._anonymize(buffer)
+
+    def _chunks(self) -> Iterator[str]:
+        """Iterate over the raw chunks of the source."""
+        if hasattr(self._source, 'read'):
+            read = self._source.read
+            return iter(lambda: read(self._segment_size), '')
+        return iter(self._source)
+
+    def _find_cut(self, buffer: str) -> int:
+        """
+        Find where to split the buffer so the rest can wait for more input.
+
+        Returns:
+            Start of the last sentence, or 0 to keep collecting
+        """
+        last_start = 0
+        for start, _ in get_sentence_tokenizer().span_tokenize(buffer):
+            last_start = start
+        if last_start:
+            return last_start
+
+        # A single sentence larger than the limit: split after the last line
+        # break, which names do not cross, or failing that after a space.
+        if len(buffer) >= 4 * self._segment_size:
+            return buffer.rfind('\n') + 1 or buffer.rfind(' ') + 1 or len(buffer)
+        return 0
+
+    def _anonymize(self, segment: str) -> str:
+        """Anonymize one segment with the shared mapping builder."""
+        if not segment.strip():
+            return segment
+        return self._anonymizer._anonymize(segment, self._builder, sentence_cache=self._cache)
@@ -0,0 +1,243 @@
+"""
+Anonymization of tables: CSV files, rows and columns.
+
+Exports often repeat the same values in every row, so each distinct value
+of a column is anonymized once and the result is reused for its other
+occurrences. All cells share one mapping, so a value gets the same
+placeholder wherever it appears in the table.
+
+    table = TableAnonymizer(columns={'customer_name': ['name'], 'account_id': 'id', 'notes': None})
+    with open('export.csv') as source, open('export.anon.csv', 'w') as output:
+        table.anonymize_csv(source, output)
+"""
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, TextIO, Tuple, Union
+import csv
+import numpy as np
+from anonymizer.core import Anonymizer
+from anonymizer.filters.name import name_placeholders
+from anonymizer.mapping import SubstitutionMapping
+
+# Per column: None runs all filters, a list of names runs those filters, and
+# a string replaces every non-empty cell whole with placeholders of that type
+ColumnSpec = Union[None, Sequence[str], str]
+
+Row = Union[Sequence[Any], Mapping[str, Any]]
+
+
+class TableAnonymizer:
+    """
+    Anonymizes tabular data column by column with deduplicated values.
+    """
+
+    def __init__(self, anonymizer: Optional[Anonymizer] = None,
+                 columns: Optional[Mapping[str, ColumnSpec]] = None, cache_size: int = 100000):
+        """
+        Initialize the table anonymizer.
+
+        Args:
+            anonymizer: Anonymizer whose settings and vault are used; one with
+                all filters if None
+            columns: What to do per column name. A list of filter names
+                runs only those filters and None runs all of them. A string
+                such as 'id' treats each cell as one entity of that type,
+                for values like bare account numbers that have no indicator
+                word around them; 'name' splits the cell into first and last
+                name like the name filter. Columns missing here are copied unchanged.
+                If None, every column runs all filters.
+            cache_size: Distinct values remembered per column setting; the
+                cache is emptied when it grows beyond this
+        """
+        self.anonymizer = anonymizer if anonymizer is not None else Anonymizer()
+        self.columns = dict(columns) if columns is not None else None
+        self.cache_size = cache_size
+        self._builder = self.anonymizer._new_builder()
+        self._anonymizers: Dict[Tuple[str, ...], Anonymizer] = {}
+        self._caches: Dict[Tuple, Dict[str, str]] = {}
+        self._cells: Dict[str, Optional[Callable[[Any], Any]]] = {}
+        self._counts = {'cells': 0, 'unique_values': 0}
+
+    @property
+    def mapping(self) -> SubstitutionMapping:
+        """Mapping of all placeholders assigned so far."""
+        return self._builder.freeze()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get counts of processed cells.
+
+        Returns:
+            Dictionary with 'cells' and 'unique_values', the number of
+            values that were actually analyzed
+        """
+        return dict(self._counts)
+
+    def anonymize_value(self, column: str, value: Any) -> Any:
+        """
+        Anonymize one cell.
+
+        Args:
+            column: Column name
+            value: Cell value; non-string values are anonymized as text
+
+        Returns:
+            Anonymized text, or the value itself if nothing was replaced
+        """
+        cell = self._cell_function(column)
+        return value if cell is None else cell(value)
+
+    def anonymize_rows(self, rows: Iterable[Row], header: Optional[Sequence[str]] = None) -> Iterator[Row]:
+        """
+        Anonymize rows one at a time.
+
+        Rows may be sequences, like those of csv.reader, or mappings from
+        column name to value, like those of csv.DictReader.
+
+        Args:
+            rows: Rows to anonymize
+            header: Column names of sequence rows; if None, the first row is
+                the header and is passed through unchanged
+
+        Yields:
+            Anonymized rows of the same kind
+        """
+        rows = iter(rows)
+        cells: Optional[List[Optional[Callable[[Any], Any]]]] = None
+        if header is not None:
+            cells = [self._cell_function(name) for name in header]
+
+        for row in rows:
+            if isinstance(row, Mapping):
+                yield {name: self.anonymize_value(name, value) for name, value in row.items()}
+                continue
+            if cells is None:
+                cells = [self._cell_function(name) for name in row]
+                yield row
+                continue
+            yield [
+                value if cell is None else cell(value)
+                for cell, value in zip(cells, row)
+            ] + list(row[len(cells):])
+
+    def anonymize_csv(self, source: TextIO, output: TextIO, **fmtparams):
+        """
+        Anonymize a CSV file with a header line, streaming row by row.
+
+        Args:
+            source: CSV input
+            output: Destination for the anonymized CSV
+            fmtparams: Dialect and formatting options for csv.reader and csv.writer
+        """
+        csv.writer(output, **fmtparams).writerows(self.anonymize_rows(csv.reader(source, **fmtparams)))
+
+    def anonymize_columns(self, columns: Mapping[str, Sequence[Any]]) -> Dict[str, Sequence[Any]]:
+        """
+        Anonymize whole columns.
+
+        Each column's distinct values are anonymized once and scattered back
+        to their rows. Placeholders are numbered column by column.
+
+        Args:
+            columns: Column name to values; lists, tuples or NumPy arrays
+
+        Returns:
+            Column name to anonymized values; NumPy arrays come back as
+            object arrays, other sequences as lists
+        """
+        result = {}
+        for name, values in columns.items():
+            cell = self._cell_function(name)
+            if cell is None:
+                result[name] = values
+                continue
+
+            # Positions of each distinct value
+            codes: Dict[Any, int] = {}
+            uniques = []
+            inverse = []
+            for value in (values.tolist() if isinstance(values, np.ndarray) else values):
+                code = codes.get(value)
+                if code is None:
+                    code = codes[value] = len(uniques)
+                    uniques.append(value)
+                inverse.append(code)
+
+            anonymized = [cell(value) for value in uniques]
+            if isinstance(values, np.ndarray):
+                output = np.empty(len(anonymized), dtype=object)
+                output[:] = anonymized
+                result[name] = output[np.asarray(inverse, dtype=np.intp)].reshape(values.shape)
+            else:
+                result[name] = [anonymized[code] for code in inverse]
+            self._counts['cells'] += len(inverse) - len(uniques)
+        return result
+
+    def _cell_function(self, column: str) -> Optional[Callable[[Any], Any]]:
+        """
+        Build the function that anonymizes a cell of a column.
+
+        Returns:
+            Function from value to anonymized value, or None for columns
+            that are copied unchanged
+        """
+        if column in self._cells:
+            return self._cells[column]
+
+        if self.columns is None:
+            spec: ColumnSpec = None
+        elif column in self.columns:
+            spec = self.columns[column]
+        else:
+            self._cells[column] = None
+            return None
+
+        if isinstance(spec, str):
+            entity_type = spec.lower()
+            key: Tuple = ('entity', entity_type)
+
+            if entity_type == 'name':
+                def detect(text: str) -> str:
+                    return name_placeholders(self._builder, text)
+            else:
+                def detect(text: str) -> str:
+                    return self._builder.placeholders(entity_type, [None], (text,))[0]
+        else:
+            selection = tuple(sorted(name.lower() for name in spec)) if spec is not None else None
+            key = ('filters', selection)
+            anonymizer = self._anonymizer(selection)
+
+            def detect(text: str) -> str:
+                return anonymizer._anonymize(text, self._builder)
+
+        cache = self._caches.setdefault(key, {})
+        counts = self._counts
+
+        def cell(value: Any) -> Any:
+            counts['cells'] += 1
+            if value is None or value != value:  # None or NaN
+                return value
+            text = value if isinstance(value, str) else str(value)
+            if not text.strip():
+                return value
+            anonymized = cache.get(text)
+            if anonymized is None:
+                if len(cache) >= self.cache_size:
+                    cache.clear()
+                anonymized = cache[text] = detect(text)
+                counts['unique_values'] += 1
+            return value if anonymized == text else anonymized
+
+        self._cells[column] = cell
+        return cell
+
+    def _anonymizer(self, selection: Optional[Tuple[str, ...]]) -> Anonymizer:
+        """Get an Anonymizer with the given filters and the settings of the main one."""
+        if selection is None:
+            return self.anonymizer
+        anonymizer = self._anonymizers.get(selection)
+        if anonymizer is None:
+            base = self.anonymizer
+            anonymizer = self._anonymizers[selection] = Anonymizer(
+                filters=list(selection), preserve_grammar=base.preserve_grammar, vault=base.vault,
+                sentence_cache=base.sentence_cache, tier=base.tier
+            )
+        return anonymizer
@@ -0,0 +1,167 @@
+"""
+NumPy backend for the averaged perceptron POS tagger.
+"""
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from nltk.tag.perceptron import PerceptronTagger
+
+
+class NumpyPerceptronTagger:
+    """
+    Drop-in replacement for PerceptronTagger.tag that scores with NumPy.
+
+    The averaged weights are copied once into a dense matrix with one row per
+    feature and one column per tag. Sentences are tagged in batches: word
+    features of all tokens are looked up up front, and the tokens at the same
+    position in every sentence are scored together.
+
+    Output is identical to nltk's tagger. Per tag, feature weights are added
+    in the order nltk adds them, so the float sums match bit for bit, and
+    tags are ordered so that argmax breaks ties like nltk's
+    max((score, label)). The matrix takes features x tags x 8 bytes.
+    """
+
+    def __init__(self, tagger: PerceptronTagger):
+        """
+        Build the weight matrix from a loaded tagger.
+
+        Args:
+            tagger: Loaded nltk PerceptronTagger
+        """
+        # Descending order makes the first maximum the alphabetically largest
+        # tag, the one nltk picks among equal scores.
+        self.classes = sorted(tagger.classes, reverse=True)
+        class_index = {label: i for i, label in enumerate(self.classes)}
+
+        weights = tagger.model.weights
+        self._features: Dict[str, int] = {}
+        matrix = np.zeros((len(weights) + 1, len(self.classes)))
+        for row, (feature, label_weights) in enumerate(weights.items()):
+            self._features[feature] = row
+            for label, weight in label_weights.items():
+                column = class_index.get(label)
+                if column is not None:
+                    matrix[row, column] = weight
+        # The last row is all zeros and stands for unknown features
+        self._unknown = len(weights)
+        self._weights = matrix
+
+        self.tagdict = tagger.tagdict
+        self.normalize = tagger.normalize
+        self.START = tagger.START
+        self.END = tagger.END
+
+    def tag(self, tokens: Sequence[str]) -> List[Tuple[str, str]]:
+        """
+        Tag one sentence.
+
+        Args:
+            tokens: Words of the sentence
+
+        Returns:
+            List of (word, tag) tuples
+        """
+        return self.tag_sents([tokens])[0]
+
+    def tag_sents(self, sentences: Sequence[Sequence[str]]) -> List[List[Tuple[str, str]]]:
+        """
+        Tag several sentences in one batch.
+
+        Args:
+            sentences: Words of each sentence
+
+        Returns:
+            List of (word, tag) tuples per sentence
+        """
+        feature = self._features.get
+        unknown = self._unknown
+        weights = self._weights
+        tagdict = self.tagdict
+        classes = self.classes
+
+        # Word features, in the order nltk adds them around the tag features
+        contexts = []
+        heads = []
+        tails = []
+        for tokens in sentences:
+            context = self.START + [self.normalize(w) for w in tokens] + self.END
+            contexts.append(context)
+            for i, word in enumerate(tokens):
+                c = i + 2
+                heads.append((
+                    feature('bias', unknown),
+                    feature('i suffix ' + word[-3:], unknown),
+                    feature('i pref1 ' + (word[0] if word else ''), unknown),
+                ))
+                tails.append((
+                    feature('i word ' + context[c], unknown),
+                    feature('i-1 word ' + context[c - 1], unknown),
+                    feature('i-1 suffix ' + context[c - 1][-3:], unknown),
+                    feature('i-2 word ' + context[c - 2], unknown),
+                    feature('i+1 word ' + context[c + 1], unknown),
+                    feature('i+1 suffix ' + context[c + 1][-3:], unknown),
+                    feature('i+2 word ' + context[c + 2], unknown),
+                ))
+        if not heads:
+            return [[] for _ in sentences]
+
+        # Start from zeros like nltk's score dict, then add in nltk's order
+        heads = np.array(heads, dtype=np.intp)
+        partial = np.zeros((len(heads), len(classes)))
+        for k in range(heads.shape[1]):
+            partial += weights[heads[:, k]]
+        tails = np.array(tails, dtype=np.intp)
+
+        offsets = []
+        total = 0
+        for tokens in sentences:
+            offsets.append(total)
+            total += len(tokens)
+
+        tags: List[List[str]] = [[] for _ in sentences]
+        prevs = [self.START[0]] * len(sentences)
+        prev2s = [self.START[1]] * len(sentences)
+        longest = max(len(tokens) for tokens in sentences)
+
+        for i in range(longest):
+            rows = []
+            dynamic = []
+            pending = []
+            for s, tokens in enumerate(sentences):
+                if i >= len(tokens):
+                    continue
+                tag = tagdict.get(tokens[i])
+                if tag:
+                    tags[s].append(tag)
+                    continue
+                prev, prev2 = prevs[s], prev2s[s]
+                rows.append(offsets[s] + i)
+                dynamic.append((
+                    feature('i-1 tag ' + prev, unknown),
+                    feature('i-2 tag ' + prev2, unknown),
+                    feature('i tag+i-2 tag ' + prev + ' ' + prev2, unknown),
+                    feature('i-1 tag+i word ' + prev + ' ' + contexts[s][i + 2], unknown),
+                ))
+                pending.append(s)
+                tags[s].append('')
+
+            if rows:
+                dynamic = np.array(dynamic, dtype=np.intp)
+                tail = tails[rows]
+                scores = partial[rows]
+                scores += weights[dynamic[:, 0]]
+                scores += weights[dynamic[:, 1]]
+                scores += weights[dynamic[:, 2]]
+                scores += weights[tail[:, 0]]
+                scores += weights[dynamic[:, 3]]
+                for k in range(1, tail.shape[1]):
+                    scores += weights[tail[:, k]]
+                for s, best in zip(pending, scores.argmax(axis=1)):
+                    tags[s][i] = classes[best]
+
+            for s, tokens in enumerate(sentences):
+                if i < len(tokens):
+                    prev2s[s] = prevs[s]
+                    prevs[s] = tags[s][i]
+
+        return [list(zip(tokens, sentence_tags)) for tokens, sentence_tags in zip(sentences, tags)]
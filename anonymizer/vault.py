@@ -0,0 +1,359 @@
+"""
+Persistent pseudonym vault that keeps placeholders stable across documents.
+"""
+from typing import AbstractSet, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from collections import OrderedDict
+import sqlite3
+import threading
+from anonymizer.mapping import PLACEHOLDER_PATTERN, SubstitutionMapping, format_placeholder
+
+# SQLite limits the number of bound parameters per statement
+_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    entity_type TEXT NOT NULL,
+    entity_key TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    PRIMARY KEY (entity_type, entity_key)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    entity_type TEXT PRIMARY KEY,
+    last_idx INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS substitutions (
+    placeholder TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class _LRUCache:
+    """Small bounded mapping that evicts the least recently used entry. Not thread-safe."""
+
+    def __init__(self, maxsize: int):
+        """Initialize the cache."""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def info(self) -> Dict[str, float]:
+        """Hit and miss counts, hit rate and current size."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits, 'misses': self.misses, 'size': len(self._data),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class PseudonymVault:
+    """
+    SQLite-backed store that gives each entity the same placeholder everywhere.
+
+    Entities are numbered per filter the first time any document mentions
+    them, and the numbers are kept in the database so every later document
+    and every other process sharing the file gets the same placeholders. Any
+    anonymized document can then be restored from the vault alone.
+
+    Lookups go through an in-process LRU cache. Entities not in the cache are
+    resolved for a whole document with one query, and new ones are inserted
+    in one transaction, so there is no database round trip per token.
+    """
+
+    def __init__(self, path: str, cache_size: int = 100000):
+        """
+        Open or create a vault.
+
+        Args:
+            path: SQLite database file, or ':memory:'
+            cache_size: Number of entities and placeholders kept in memory
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(_SCHEMA)
+        self._entities = _LRUCache(cache_size)
+        self._values = _LRUCache(cache_size)
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+    def cache_info(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get the statistics of the in-process caches.
+
+        Returns:
+            Hits, misses, hit rate and size of the entity and placeholder caches
+        """
+        with self._lock:
+            return {'entities': self._entities.info(), 'values': self._values.info()}
+
+    def builder(self) -> 'VaultMappingBuilder':
+        """
+        Get a mapping builder that assigns placeholders from this vault.
+
+        Returns:
+            Builder for a single anonymization call
+        """
+        return VaultMappingBuilder(self)
+
+    def assign(self, entities: Iterable[Tuple[str, Sequence[Optional[str]], Tuple[str, ...]]]) -> Dict[Tuple[str, Tuple[str, ...]], int]:
+        """
+        Get the numbers of entities, assigning new ones where needed.
+
+        Args:
+            entities: (filter_name, labels, values) tuples
+
+        Returns:
+            Number per (filter_name, values) key
+
+        Raises:
+            ValueError: If a new entity would get a placeholder that already
+                stands for an entity of another type
+        """
+        result = {}
+        missing = {}
+        with self._lock:
+            for filter_name, labels, values in entities:
+                key = (filter_name, values)
+                idx = self._entities.get(key)
+                if idx is not None:
+                    result[key] = idx
+                elif key not in missing:
+                    missing[key] = labels
+
+            if missing:
+                result.update(self._assign_missing(missing))
+        return result
+
+    def lookup(self, placeholders: Iterable[str]) -> Dict[str, str]:
+        """
+        Get the original values of placeholders.
+
+        Args:
+            placeholders: Placeholders to resolve
+
+        Returns:
+            Original value per known placeholder
+        """
+        result = {}
+        missing = []
+        with self._lock:
+            for placeholder in set(placeholders):
+                value = self._values.get(placeholder)
+                if value is not None:
+                    result[placeholder] = value
+                else:
+                    missing.append(placeholder)
+
+            if missing:
+                for batch in _batches(missing):
+                    rows = self._conn.execute(
+                        f"SELECT placeholder, value FROM substitutions "
+                        f"WHERE placeholder IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+                    for placeholder, value in rows:
+                        self._values.put(placeholder, value)
+                        result[placeholder] = value
+        return result
+
+    def restore(self, text: str) -> str:
+        """
+        Replace every placeholder known to the vault with its original value.
+
+        Args:
+            text: Text containing placeholders
+
+        Returns:
+            Text with the original values restored
+        """
+        if not text:
+            return text
+        values = self.lookup(m.group(0) for m in PLACEHOLDER_PATTERN.finditer(text))
+        return PLACEHOLDER_PATTERN.sub(lambda m: values.get(m.group(0), m.group(0)), text)
+
+    def _assign_missing(self, missing: Dict[Tuple[str, Tuple[str, ...]], Sequence[Optional[str]]]) -> Dict[Tuple[str, Tuple[str, ...]], int]:
+        """Resolve entities not in the cache, inserting new ones in one transaction."""
+        conn = self._conn
+        result = {}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            by_type: Dict[str, List[Tuple[str, ...]]] = {}
+            for filter_name, values in missing:
+                by_type.setdefault(filter_name, []).append(values)
+
+            new_entities = []
+            new_substitutions = []
+            for filter_name, values_list in by_type.items():
+                keys = {_entity_key(values): values for values in values_list}
+                for batch in _batches(list(keys)):
+                    rows = conn.execute(
+                        f"SELECT entity_key, idx FROM entities WHERE entity_type = ? "
+                        f"AND entity_key IN ({','.join('?' * len(batch))})",
+                        [filter_name] + batch
+                    ).fetchall()
+                    for entity_key, idx in rows:
+                        result[(filter_name, keys.pop(entity_key))] = idx
+
+                if not keys:
+                    continue
+                row = conn.execute(
+                    "SELECT last_idx FROM counters WHERE entity_type = ?", (filter_name,)
+                ).fetchone()
+                last_idx = row[0] if row else 0
+                for entity_key, values in keys.items():
+                    last_idx += 1
+                    result[(filter_name, values)] = last_idx
+                    new_entities.append((filter_name, entity_key, last_idx))
+                    labels = missing[(filter_name, values)]
+                    for label, value in zip(labels, values):
+                        placeholder = format_placeholder(label or filter_name, last_idx)
+                        new_substitutions.append((placeholder, value))
+                conn.execute(
+                    "INSERT OR REPLACE INTO counters (entity_type, last_idx) VALUES (?, ?)",
+                    (filter_name, last_idx)
+                )
+
+            conn.executemany(
+                "INSERT INTO entities (entity_type, entity_key, idx) VALUES (?, ?, ?)",
+                new_entities
+            )
+            try:
+                # A placeholder is never reassigned, or restoring documents
+                # issued earlier would return the wrong value
+                conn.executemany(
+                    "INSERT INTO substitutions (placeholder, value) VALUES (?, ?)",
+                    new_substitutions
+                )
+            except sqlite3.IntegrityError as e:
+                raise ValueError(
+                    "Two entity types render the same placeholder label; "
+                    "give their filters distinct names or labels"
+                ) from e
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        for key, idx in result.items():
+            self._entities.put(key, idx)
+        return result
+
+
+class VaultMappingBuilder:
+    """
+    Mapping builder that takes entity numbers from a PseudonymVault.
+
+    It has the same interface as MappingBuilder, so the Anonymizer can use
+    either.
+    """
+
+    def __init__(self, vault: PseudonymVault):
+        """Initialize the builder."""
+        self._vault = vault
+        self._numbers: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+        self._substitutions: Dict[str, str] = {}
+        self._reverse: Dict[str, str] = {}
+        self._known: Dict[str, Set[Tuple[str, ...]]] = {}
+        self._added: List[str] = []
+
+    def known_values(self, filter_name: str) -> AbstractSet[Tuple[str, ...]]:
+        """
+        Get the values of the entities of one type that have placeholders.
+
+        Args:
+            filter_name: Entity type
+
+        Returns:
+            Values tuples, one per entity
+        """
+        return self._known.get(filter_name, frozenset())
+
+    def added_values(self, since: int = 0) -> List[str]:
+        """
+        Get the original texts of entities in the order they got placeholders.
+
+        Args:
+            since: Number of entities to skip, e.g. those seen by an earlier call
+
+        Returns:
+            Texts of the entities added after the first since ones
+        """
+        return self._added[since:]
+
+    def reserve(self, entities: Iterable[Tuple[str, Sequence[Optional[str]], Tuple[str, ...]]]):
+        """
+        Resolve the numbers of all entities of a document in one batch.
+
+        Args:
+            entities: (filter_name, labels, values) tuples
+        """
+        self._numbers.update(self._vault.assign(entities))
+
+    def placeholders(self, filter_name: str, labels: Sequence[Optional[str]],
+                     values: Tuple[str, ...]) -> List[str]:
+        """
+        Get the placeholders for one occurrence of an entity.
+
+        Args:
+            filter_name: Entity type, normally the name of the filter that detected it
+            labels: Placeholder label per part; None uses the filter name
+            values: Original text per part
+
+        Returns:
+            One placeholder per part
+        """
+        key = (filter_name, values)
+        idx = self._numbers.get(key)
+        if idx is None:
+            self.reserve([(filter_name, labels, values)])
+            idx = self._numbers[key]
+        known = self._known.setdefault(filter_name, set())
+        if values not in known:
+            known.add(values)
+            self._added.append(' '.join(values))
+
+        placeholders = []
+        for label, value in zip(labels, values):
+            placeholder = format_placeholder(label or filter_name, idx)
+            self._substitutions[placeholder] = value
+            placeholders.append(placeholder)
+        self._reverse[' '.join(values)] = ' '.join(placeholders)
+        return placeholders
+
+    def freeze(self) -> SubstitutionMapping:
+        """
+        Get an immutable snapshot of the placeholders used so far.
+
+        Returns:
+            SubstitutionMapping with the placeholders of this builder
+        """
+        return SubstitutionMapping(self._substitutions, self._reverse)
+
+
+def _entity_key(values: Tuple[str, ...]) -> str:
+    """Serialize entity values into a single key."""
+    return '\x1f'.join(values)
+
+
+def _batches(items: List) -> Iterable[List]:
+    """Split a list into chunks that fit in one SQLite statement."""
+    for i in range(0, len(items), _BATCH_SIZE):
+        yield items[i:i + _BATCH_SIZE]
@@ -0,0 +1,123 @@
+"""
+Deterministic synthetic corpora for benchmarks.
+
+The same kind, size and seed always produce the same text, so results are
+comparable between runs and machines.
+"""
+from typing import Callable, Dict, List
+import random
+
+FIRST_NAMES = [
+    'John', 'Jane', 'Robert', 'Alice', 'Mary', 'David', 'Anna', 'Peter',
+    'Michael', 'Sarah', 'Tadeusz', 'Emma', 'James', 'Olivia', 'Thomas', 'Laura'
+]
+SURNAMES = [
+    'Smith', 'Wilson', 'Johnson', 'Doe', 'Brown', 'Kowalski', 'Taylor',
+    'Miller', 'Davis', 'Clark', 'Nowak', 'Walker', 'Harris', 'Lewis'
+]
+TITLES = ['Dr.', 'Mr.', 'Mrs.', 'Ms.', 'Professor', 'Pan', 'Pani']
+FILLER = (
+    'we have processed your request and will follow up shortly with the '
+    'results of the review the team has looked at the logs and found no '
+    'further issues please let us know if anything else comes up'
+).split()
+SIZES = {'KB': 1024, 'MB': 1024 ** 2}
+
+
+def parse_size(size: str) -> int:
+    """Parse a size such as '1KB' or '100MB' into bytes."""
+    size = size.strip().upper()
+    for unit, factor in SIZES.items():
+        if size.endswith(unit):
+            return int(float(size[:-len(unit)]) * factor)
+    return int(size)
+
+
+def _name(rnd: random.Random) -> str:
+    return f"{rnd.choice(FIRST_NAMES)} {rnd.choice(SURNAMES)}"
+
+
+def _sentence(rnd: random.Random, words: int) -> str:
+    text = ' '.join(rnd.choice(FILLER) for _ in range(words))
+    return text[0].upper() + text[1:] + '.'
+
+
+def _id(rnd: random.Random) -> str:
+    return rnd.choice([
+        lambda: str(rnd.randint(10000, 999999999)),
+        lambda: f"{''.join(rnd.choice('ABCDEFGHJK') for _ in range(3))}-{rnd.randint(100, 99999)}",
+        lambda: f"{rnd.randint(10, 9999)}-{rnd.randint(10, 9999)}-{rnd.randint(10, 9999)}",
+    ])()
+
+
+def email(rnd: random.Random) -> str:
+    """One email in the style of the README example."""
+    return (
+        f"Dear {rnd.choice(TITLES)} {_name(rnd)},\n\n"
+        f"Regarding your account number {_id(rnd)}, {_sentence(rnd, 12)}\n"
+        f"{_sentence(rnd, 15)}\n"
+        f"Best regards,\n{_name(rnd)}\nTechnical Support\n\n"
+    )
+
+
+def dense_ids(rnd: random.Random) -> str:
+    """A paragraph with an ID in nearly every sentence."""
+    indicators = ['case', 'ID', 'reference', 'account number', 'serial', 'code']
+    return ' '.join(
+        f"{rnd.choice(indicators).capitalize()} {_id(rnd)} {' '.join(rnd.choice(FILLER) for _ in range(4))}."
+        for _ in range(8)
+    ) + '\n'
+
+
+def transcript(rnd: random.Random) -> str:
+    """A chat transcript line mentioning several people."""
+    return (
+        f"{_name(rnd)}: I spoke with {rnd.choice(TITLES)} {_name(rnd)} and "
+        f"{_name(rnd)} about it, {' '.join(rnd.choice(FILLER) for _ in range(6))}.\n"
+    )
+
+
+KINDS: Dict[str, Callable[[random.Random], str]] = {
+    'email': email,
+    'dense_ids': dense_ids,
+    'transcript': transcript,
+}
+
+
+def generate(kind: str, size: int, seed: int = 0) -> str:
+    """
+    Generate a document of about the given size.
+
+    Args:
+        kind: One of KINDS
+        size: Target size in characters
+        seed: Random seed
+
+    Returns:
+        Document text of at least size characters, cut at a unit boundary
+    """
+    rnd = random.Random(f"{kind}:{size}:{seed}")
+    unit = KINDS[kind]
+    parts: List[str] = []
+    length = 0
+    while length < size:
+        part = unit(rnd)
+        parts.append(part)
+        length += len(part)
+    return ''.join(parts)
+
+
+def corpus(kind: str, size: int, count: int, seed: int = 0) -> List[str]:
+    """
+    Generate several documents of the same kind and size.
+
+    Args:
+        kind: One of KINDS
+        size: Target size of each document in characters
+        count: Number of documents
+        seed: Random seed of the first document
+
+    Returns:
+        List of documents
+    """
+    return [generate(kind, size, seed + i) for i in range(count)]
@@ -0,0 +1,191 @@
+"""
+Throughput benchmark: docs/sec, latency percentiles and peak memory per stage.
+
+Every (stage, corpus kind, document size) cell runs in a fresh interpreter so
+its peak RSS is not inflated by earlier cells. Corpora come from
+benchmarks/corpus.py and are identical on every run.
+
+    python benchmarks/run.py --sizes 1KB,10KB,100KB
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json --threshold 0.2
+    python benchmarks/run.py --stages hide --tiers fast,balanced,accurate
+
+Anonymizing stages also report recall: the share of the names and IDs the
+corpus generator planted that no longer appear in the output.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import corpus  # noqa: E402
+
+STAGES = ['name_filter', 'id_filter', 'hide', 'hide_no_grammar', 'fill']
+
+# Metrics where a larger value is a regression
+LOWER_IS_BETTER = ('p50_ms', 'p99_ms', 'peak_rss_mb')
+
+# Absolute drop in recall counted as a regression
+RECALL_TOLERANCE = 0.01
+
+# Names and IDs planted by the corpus generators
+PLANTED = re.compile(
+    rf"\b(?:{'|'.join(corpus.FIRST_NAMES + corpus.SURNAMES)})\b"
+    r"|\b\d{5,}\b|\b[A-Z]{3}-\d+\b|\b\d+-\d+-\d+\b"
+)
+
+
+def recall(inputs: list, outputs: list) -> float:
+    """Share of planted names and IDs removed from the outputs."""
+    planted = sum(len(PLANTED.findall(text)) for text in inputs)
+    left = sum(len(PLANTED.findall(text)) for text in outputs)
+    return 1 - left / planted if planted else 1.0
+
+
+def _stage(name: str, docs: list, tier: str = 'accurate'):
+    """Build the function timed for a stage and its per-document inputs."""
+    from anonymizer import Anonymizer
+    from anonymizer.filters.id import IdFilter
+    from anonymizer.filters.name import NameFilter
+
+    if name == 'name_filter':
+        return NameFilter().find, docs
+    if name == 'id_filter':
+        return IdFilter().find, docs
+
+    anonymizer = Anonymizer(preserve_grammar=name != 'hide_no_grammar', tier=tier)
+    if name in ('hide', 'hide_no_grammar'):
+        return anonymizer.hide_personal_data_with_mapping, docs
+
+    # Stages that work on anonymized output get it prepared untimed
+    hidden = [anonymizer.hide_personal_data_with_mapping(doc) for doc in docs]
+    if name == 'fill':
+        return lambda item: anonymizer.fill_personal_data(*item), hidden
+    raise ValueError(f"Unknown stage: {name}")
+
+
+def run_cell(stage: str, kind: str, size: int, count: int, tier: str = 'accurate') -> dict:
+    """Time one stage over a generated corpus in the current process."""
+    import resource
+
+    docs = corpus.corpus(kind, size, count)
+    func, inputs = _stage(stage, docs, tier)
+    func(inputs[0])  # load models outside the timed loop
+
+    latencies = []
+    outputs = []
+    start = time.perf_counter()
+    for item in inputs:
+        t = time.perf_counter()
+        outputs.append(func(item))
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    metrics = {
+        'docs': len(inputs),
+        'docs_per_sec': len(inputs) / elapsed if elapsed else float('inf'),
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'peak_rss_mb': peak_kb / 1024 if sys.platform != 'darwin' else peak_kb / 1024 ** 2,
+    }
+    if stage in ('hide', 'hide_no_grammar'):
+        metrics['recall'] = recall(docs, [text for text, _ in outputs])
+    return metrics
+
+
+def spawn_cell(stage: str, kind: str, size: int, count: int, tier: str = 'accurate') -> dict:
+    """Run one cell in a fresh interpreter and return its results."""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--cell', stage, kind, str(size), str(count), tier],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """List the metrics that regressed by more than threshold against the baseline."""
+    regressions = []
+    for key, metrics in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if metrics['docs_per_sec'] < base['docs_per_sec'] * (1 - threshold):
+            regressions.append(f"{key}: docs_per_sec {metrics['docs_per_sec']:.1f} < {base['docs_per_sec']:.1f}")
+        for metric in LOWER_IS_BETTER:
+            if metrics[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{key}: {metric} {metrics[metric]:.2f} > {base[metric]:.2f}")
+        if 'recall' in metrics and 'recall' in base and metrics['recall'] < base['recall'] - RECALL_TOLERANCE:
+            regressions.append(f"{key}: recall {metrics['recall']:.3f} < {base['recall']:.3f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f"comma-separated stages from {', '.join(STAGES)}")
+    parser.add_argument('--kinds', default=','.join(corpus.KINDS),
+                        help=f"comma-separated corpora from {', '.join(corpus.KINDS)}")
+    parser.add_argument('--sizes', default='1KB,10KB,100KB',
+                        help='comma-separated document sizes, 1KB up to 100MB')
+    parser.add_argument('--tiers', default='accurate',
+                        help='comma-separated detection tiers from fast, balanced, accurate')
+    parser.add_argument('--docs', type=int, default=50, help='documents per cell')
+    parser.add_argument('--budget', default='2MB',
+                        help='maximum total text per cell; large sizes get fewer documents')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed relative regression against the baseline')
+    parser.add_argument('--save-baseline', help='write the results to this JSON file')
+    parser.add_argument('--cell', nargs=5, metavar=('STAGE', 'KIND', 'SIZE', 'COUNT', 'TIER'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cell:
+        stage, kind, size, count, tier = args.cell
+        print(json.dumps(run_cell(stage, kind, int(size), int(count), tier)))
+        return
+
+    budget = corpus.parse_size(args.budget)
+    results = {}
+    print(f"{'cell':<36} {'docs':>5} {'docs/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'RSS MB':>8} {'recall':>7}")
+    for size_name in args.sizes.split(','):
+        size = corpus.parse_size(size_name)
+        count = max(1, min(args.docs, budget // size))
+        for kind in args.kinds.split(','):
+            for stage in args.stages.split(','):
+                for tier in args.tiers.split(','):
+                    # Accurate keys keep their names so older baselines still apply
+                    name = stage if tier == 'accurate' else f"{stage}@{tier}"
+                    key = f"{name}/{kind}/{size_name.strip()}"
+                    metrics = spawn_cell(stage, kind, size, count, tier)
+                    results[key] = metrics
+                    found = f"{metrics['recall']:>7.3f}" if 'recall' in metrics else f"{'':>7}"
+                    print(f"{key:<36} {metrics['docs']:>5} {metrics['docs_per_sec']:>10.1f} "
+                          f"{metrics['p50_ms']:>10.2f} {metrics['p99_ms']:>10.2f} "
+                          f"{metrics['peak_rss_mb']:>8.1f} {found}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            print(f"FAIL: {len(regressions)} metrics regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
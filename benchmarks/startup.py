@@ -0,0 +1,63 @@
+"""
+Startup benchmark: time to import the package and construct an Anonymizer.
+
+Each sample runs in a fresh interpreter so module imports and model loading
+are measured the way a short-lived job sees them.
+
+    python benchmarks/startup.py --runs 10
+    python benchmarks/startup.py --first-call --max-seconds 2.5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# The snippet imports the package from this checkout, wherever it is run from
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import time
+start = time.perf_counter()
+from anonymizer import Anonymizer
+anonymizer = Anonymizer()
+constructed = time.perf_counter()
+if {first_call}:
+    anonymizer.hide_personal_data("Dear Dr. Jane Wilson, your case 12345 is open.")
+print(constructed - start, time.perf_counter() - start)
+"""
+
+def run_once(first_call: bool) -> tuple:
+    """Run one sample in a fresh interpreter and return (construct, total) seconds."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    output = subprocess.run(
+        [sys.executable, '-c', SNIPPET.format(first_call=first_call)],
+        check=True, capture_output=True, text=True, env=env
+    ).stdout.split()
+    return float(output[-2]), float(output[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='number of fresh interpreters to time')
+    parser.add_argument('--first-call', action='store_true',
+                        help='also time the first hide_personal_data call')
+    parser.add_argument('--max-seconds', type=float,
+                        help='exit with an error if the median exceeds this')
+    args = parser.parse_args()
+
+    samples = [run_once(args.first_call) for _ in range(args.runs)]
+    construct = statistics.median(s[0] for s in samples)
+    total = statistics.median(s[1] for s in samples)
+
+    print(f"import + construct: median {construct * 1000:.1f} ms over {args.runs} runs")
+    if args.first_call:
+        print(f"import + construct + first call: median {total * 1000:.1f} ms")
+
+    measured = total if args.first_call else construct
+    if args.max_seconds is not None and measured > args.max_seconds:
+        print(f"FAIL: {measured:.3f}s exceeds {args.max_seconds:.3f}s")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
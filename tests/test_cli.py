@@ -0,0 +1,78 @@
+import json
+from anonymizer.cli import main
+
+def test_cli_jsonl_roundtrip(tmp_path, capsys):
+    """Test hiding and restoring a JSONL field with a mapping sidecar."""
+    source = tmp_path / "tickets.jsonl"
+    records = [{"id": 1, "body": "Your case 12345 is open"}, {"id": 2}]
+    source.write_text(''.join(json.dumps(r) + '\n' for r in records))
+    sidecar = tmp_path / "tickets.map.jsonl"
+
+    assert main(['hide', '--jsonl', '--field', 'body', '--filters', 'id',
+                 '--mapping', str(sidecar), str(source)]) == 0
+    out, err = capsys.readouterr()
+    hidden = [json.loads(line) for line in out.splitlines()]
+    assert hidden == [{"id": 1, "body": "Your case <ID_1> is open"}, {"id": 2}]
+    assert "hide: 2 documents" in err
+
+    anonymized = tmp_path / "anon.jsonl"
+    anonymized.write_text(out)
+    main(['fill', '--jsonl', '--field', 'body', '--mapping', str(sidecar), '--quiet', str(anonymized)])
+    assert [json.loads(line) for line in capsys.readouterr().out.splitlines()] == records
+
+def test_cli_directory(tmp_path, capsys):
+    """Test hiding a directory tree into an output directory and restoring it."""
+    (tmp_path / "in" / "sub").mkdir(parents=True)
+    (tmp_path / "in" / "a.txt").write_text("Your case 12345 is open.")
+    (tmp_path / "in" / "sub" / "b.txt").write_text("Your case 67890 is open.")
+    sidecar = str(tmp_path / "map.jsonl")
+
+    main(['hide', '--filters', 'id', '--quiet', '--mapping', sidecar,
+          '--output-dir', str(tmp_path / "out"), str(tmp_path / "in")])
+    assert (tmp_path / "out" / "sub" / "b.txt").read_text() == "Your case <ID_1> is open."
+
+    main(['fill', '--quiet', '--mapping', sidecar, '--output-dir', str(tmp_path / "back"),
+          str(tmp_path / "out")])
+    assert (tmp_path / "back" / "a.txt").read_text() == "Your case 12345 is open."
+    assert (tmp_path / "back" / "sub" / "b.txt").read_text() == "Your case 67890 is open."
+
+def test_cli_binary_mappings(tmp_path, capsys):
+    """Test writing and reading a packed binary mapping sidecar."""
+    source = tmp_path / "tickets.jsonl"
+    source.write_text('{"text": "Your case 12345 is open"}\n{"text": "Your case 67890 is open"}\n')
+    sidecar = str(tmp_path / "map.bin")
+
+    main(['hide', '--jsonl', '--filters', 'id', '--quiet', '--mapping-format', 'binary',
+          '--mapping', sidecar, str(source)])
+    anonymized = tmp_path / "anon.jsonl"
+    anonymized.write_text(capsys.readouterr().out)
+    assert (tmp_path / "map.bin").read_bytes().startswith(b'AMAP')
+
+    main(['fill', '--jsonl', '--quiet', '--mapping-format', 'binary', '--mapping', sidecar,
+          str(anonymized)])
+    assert capsys.readouterr().out == source.read_text()
+
+def test_cli_streams_large_files(tmp_path, capsys, monkeypatch):
+    """Test that files over the stream size are streamed between whole-read ones."""
+    from anonymizer import cli
+
+    monkeypatch.setattr(cli, 'STREAM_SIZE', 100)
+    monkeypatch.setattr(cli, 'CHUNK_SIZE', 16)
+    (tmp_path / "in").mkdir()
+    (tmp_path / "in" / "a.txt").write_text("Your case 12345 is open.")
+    (tmp_path / "in" / "b.txt").write_text("Your case 67890 is open. " * 10)
+    (tmp_path / "in" / "c.txt").write_text("Your case 13579 is open.")
+    sidecar = str(tmp_path / "map.jsonl")
+
+    main(['hide', '--filters', 'id', '--mapping', sidecar,
+          '--output-dir', str(tmp_path / "out"), str(tmp_path / "in")])
+    assert (tmp_path / "out" / "b.txt").read_text() == "Your case <ID_1> is open. " * 10
+    assert "hide: 3 documents, 0.00M characters" in capsys.readouterr().err
+    sources = [json.loads(line)['source'] for line in open(sidecar)]
+    assert [source[-5:] for source in sources] == ['a.txt', 'b.txt', 'c.txt']
+
+    main(['fill', '--quiet', '--mapping', sidecar, '--output-dir', str(tmp_path / "back"),
+          str(tmp_path / "out")])
+    for name in ('a.txt', 'b.txt', 'c.txt'):
+        assert (tmp_path / "back" / name).read_text() == (tmp_path / "in" / name).read_text()
+
@@ -64,6 +64,25 @@ def test_grammar_preservation():
 
     assert "a <FIRST_NAME_1> <LAST_NAME_1>" in anonymized
 
+def test_article_correction():
+    """Test that articles in front of placeholders are fixed in place."""
+    from anonymizer.base import BaseFilter
+
+    class ItemFilter(BaseFilter):
+        def find(self, text):
+            return ['Apollo']
+
+    anon = Anonymizer(filters=[])
+    anon._filters['item'] = ItemFilter()
+
+    text = "A Apollo and a Apollo, not Banana Apollo or a\nApollo."
+    assert anon.hide_personal_data(text) == (
+        "An <ITEM_1> and an <ITEM_1>, not Banana <ITEM_1> or an\n<ITEM_1>."
+    )
+
+    anon.preserve_grammar = False
+    assert anon.hide_personal_data("a Apollo") == "a <ITEM_1>"
+
 def test_multiple_names():
     """Test handling of multiple names in text."""
     anon = Anonymizer(filters=['name'])
@@ -72,4 +91,201 @@ def test_multiple_names():
     anonymized = anon.hide_personal_data(text)
 
     assert "Dr. <FIRST_NAME_1> <LAST_NAME_1>" in anonymized
-    assert "Mr. <FIRST_NAME_2> <LAST_NAME_2>" in anonymized
\ No newline at end of file
+    assert "Mr. <FIRST_NAME_2> <LAST_NAME_2>" in anonymized
+
+def test_repeated_entities_share_placeholder():
+    """Test that every occurrence of an entity gets the same placeholder."""
+    anon = Anonymizer(filters=['id'])
+
+    text = "Your case 12345 is open. Please quote 12345 when replying."
+    anonymized = anon.hide_personal_data(text)
+
+    assert anonymized.count("<ID_1>") == 2
+    assert "12345" not in anonymized
+    assert anon.fill_personal_data(anonymized) == text
+
+def test_overlapping_spans():
+    """Test that overlaps are resolved by priority, then length, then score."""
+    from anonymizer.base import Span
+
+    anon = Anonymizer(filters=[])
+
+    accepted = anon._resolve_overlaps([
+        (0, Span.simple(0, 10), 'name'),
+        (1, Span.simple(5, 12), 'id'),
+        (0, Span.simple(20, 30), 'name'),
+        (0, Span.simple(22, 25), 'name'),
+        (0, Span.simple(40, 45, score=0.5), 'name'),
+        (0, Span.simple(42, 47, score=0.9), 'id'),
+    ])
+
+    assert [(span.start, span.end) for span, _ in accepted] == [(5, 12), (20, 30), (42, 47)]
+
+def test_legacy_string_filter():
+    """Test that filters returning plain strings are adapted to spans."""
+    from anonymizer.base import BaseFilter
+
+    class ProjectFilter(BaseFilter):
+        def find(self, text):
+            return ['Apollo'] if 'Apollo' in text else []
+
+    anon = Anonymizer(filters=[])
+    anon._filters['project'] = ProjectFilter()
+    anonymized, mapping = anon.hide_personal_data_with_mapping("Apollo ships soon. Apollo is late.")
+
+    assert anonymized == "<PROJECT_1> ships soon. <PROJECT_1> is late."
+    assert dict(mapping) == {"<PROJECT_1>": "Apollo"}
+
+def test_fill_unknown_placeholders():
+    """Test that restoration leaves unknown placeholders untouched."""
+    anon = Anonymizer(filters=['id'])
+
+    anonymized = anon.hide_personal_data("Your case 12345 is open")
+    reply = f"Case {anonymized.split()[2]} is linked to <ID_2> and <id_1>"
+
+    assert anon.fill_personal_data(reply) == "Case 12345 is linked to <ID_2> and <id_1>"
+
+def test_concurrent_hide_and_fill():
+    """Test that one instance serves concurrent requests with per-call mappings."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    anon = Anonymizer(filters=['id'])
+    texts = [f"Your case {10000 + i} is open" for i in range(50)]
+
+    def roundtrip(text):
+        anonymized, mapping = anon.hide_personal_data_with_mapping(text)
+        return anonymized, mapping, anon.fill_personal_data(anonymized, mapping)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(roundtrip, texts))
+
+    for text, (anonymized, mapping, restored) in zip(texts, results):
+        assert anonymized == "Your case <ID_1> is open"
+        assert dict(mapping) == {"<ID_1>": text.split()[2]}
+        assert restored == text
+
+def test_hide_personal_data_many():
+    """Test batch anonymization in worker processes keeps input order."""
+    anon = Anonymizer(filters=['id'])
+    texts = [f"Your case {10000 + i} is open" for i in range(20)]
+
+    results = list(anon.hide_personal_data_many(texts, workers=2, chunksize=3))
+
+    assert len(results) == len(texts)
+    for text, (anonymized, mapping) in zip(texts, results):
+        assert anonymized == "Your case <ID_1> is open"
+        assert anon.fill_personal_data(anonymized, mapping) == text
+
+def test_hide_personal_data_stream():
+    """Test streaming anonymization across chunk edges."""
+    anon = Anonymizer(filters=['id'])
+    text = "Your case 12345 is open. " * 20 + "Reference number 67890 was added."
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+
+    stream = anon.hide_personal_data_stream(chunks, segment_size=64)
+    anonymized = ''.join(stream)
+
+    assert anonymized.count("<ID_1>") == 20
+    assert "<ID_2>" in anonymized
+    assert "12345" not in anonymized and "67890" not in anonymized
+    assert anon.fill_personal_data(anonymized, stream.mapping) == text
+
+def test_stream_masks_ids_repeated_in_later_segments():
+    """Test that an ID found in one segment is masked when a later segment repeats it."""
+    anon = Anonymizer(filters=['id'])
+    text = "Your case 12345 is open. Please quote 12345 when replying. We got 12345 today."
+
+    stream = anon.hide_personal_data_stream([text], segment_size=32)
+    anonymized = ''.join(stream)
+
+    assert anonymized == anon.hide_personal_data(text)
+    assert anonymized.count("<ID_1>") == 3
+    assert anon.fill_personal_data(anonymized, stream.mapping) == text
+
+def test_stream_uses_its_own_sentence_cache():
+    """Test that streaming does not fill the anonymizer's sentence cache."""
+    from anonymizer.document import SentenceCache
+
+    anon = Anonymizer(filters=['id'], sentence_cache=SentenceCache())
+    text = "Your case 12345 is open. " * 20 + "log line without a break " * 50
+
+    ''.join(anon.hide_personal_data_stream([text], segment_size=64))
+    assert len(anon.sentence_cache) == 0
+
+def test_async_hide_and_fill():
+    """Test the async API with bounded concurrency."""
+    import asyncio
+
+    anon = Anonymizer(filters=['id'], max_concurrency=2)
+    texts = [f"Your case {10000 + i} is open" for i in range(10)]
+
+    async def roundtrip(text):
+        anonymized, mapping = await anon.hide_personal_data_async(text)
+        return anonymized, await anon.fill_personal_data_async(anonymized, mapping)
+
+    async def main():
+        return await asyncio.gather(*(roundtrip(text) for text in texts))
+
+    for text, (anonymized, restored) in zip(texts, asyncio.run(main())):
+        assert anonymized == "Your case <ID_1> is open"
+        assert restored == text
+
+def test_instrumentation(monkeypatch):
+    """Test per-stage stats, the metrics callback and error counting."""
+    records = []
+    anon = Anonymizer(filters=['id'], metrics_callback=records.append)
+    anon.hide_personal_data("Your case 12345 is open")
+    anon.hide_personal_data("Nothing to see here")
+
+    stats = anon.stats()
+    assert stats['enabled']
+    assert stats['documents'] == 2
+    assert stats['matches'] == {'id': 1}
+    assert stats['sizes']['<1KB'] == 2
+    for stage in ['analyze', 'filter:id', 'resolve', 'replace', 'total']:
+        assert stats['stages'][stage]['count'] == 2
+    assert len(records) == 2 and records[0]['matches'] == {'id': 1}
+
+    # Handled errors are counted instead of printed
+    def fail(*args):
+        raise ValueError("broken")
+    before = stats['errors'].get('id', 0)
+    monkeypatch.setattr('anonymizer.filters.id.IdFilter._has_indicator_nearby', fail)
+    assert anon.hide_personal_data("Your case 12345 is open") == "Your case 12345 is open"
+    assert anon.stats()['errors']['id'] == before + 1
+
+    assert not Anonymizer(filters=['id']).stats()['enabled']
+
+def test_detection_tiers(monkeypatch):
+    """Test that the fast tier runs without NLTK and tiers can be chosen per call."""
+    import anonymizer.document
+
+    text = "Dear Dr. Jane Wilson,\nYour case 12345 is open. Best regards, Robert Johnson"
+    expected = ("Dear Dr. <FIRST_NAME_1> <LAST_NAME_1>,\nYour case <ID_1> is open. "
+                "Best regards, <FIRST_NAME_2> <LAST_NAME_2>")
+    accurate = Anonymizer()
+
+    def no_nltk(*args, **kwargs):
+        pytest.fail("NLTK used in the fast tier")
+    monkeypatch.setattr(anonymizer.document, 'get_tagger', no_nltk)
+    monkeypatch.setattr(anonymizer.document, 'get_sentence_tokenizer', no_nltk)
+    monkeypatch.setattr(anonymizer.document, 'get_word_tokenizer', no_nltk)
+
+    assert Anonymizer(tier='fast').hide_personal_data(text) == expected
+    assert accurate.hide_personal_data(text, tier='fast') == expected
+    with pytest.raises(ValueError):
+        Anonymizer(tier='exhaustive')
+    with pytest.raises(ValueError):
+        accurate.hide_personal_data(text, tier='exhaustive')
+
+def test_balanced_tier_tags_candidates_only():
+    """Test that the balanced tier tags only sentences with a name candidate."""
+    from anonymizer.document import Document, SentenceCache
+    from anonymizer.filters.name import NameFilter
+
+    text = "Your case is now with the support team. Dr. Jane Wilson will call."
+    document = Document.analyze(text, cache=SentenceCache(0), tier='balanced')
+    runs = NameFilter()._find_name_runs(document)
+
+    assert [[token.text for token in parts] for _, parts in runs] == [['Jane', 'Wilson']]
+    assert [sentence.is_tagged for sentence in document.sentences] == [False, True]
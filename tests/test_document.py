@@ -0,0 +1,66 @@
+from anonymizer.document import Document
+from anonymizer.filters.name import NameFilter
+from anonymizer.filters.id import IdFilter
+
+def test_token_offsets():
+    """Test that token offsets point back into the original text."""
+    text = 'Dear Dr. Jane Wilson,\n\nYour "case" 12345 is open. Reply soon.'
+    document = Document.analyze(text)
+
+    assert len(document.sentences) == 2
+    for token in document.tokens:
+        assert text[token.start:token.end] == token.text
+    assert len(document.tagged) == len(document.tokens)
+
+def test_filters_share_document():
+    """Test that filters give the same results on a shared document."""
+    text = "Dear Dr. John Doe, your case 12345 is being processed"
+    document = Document.analyze(text)
+
+    assert NameFilter().find_in_document(document) == NameFilter().find(text)
+    assert IdFilter().find_in_document(document) == IdFilter().find(text)
+
+def test_sentence_cache():
+    """Test that repeated sentences reuse tokens, tags and filter results."""
+    from anonymizer.document import SentenceCache
+
+    cache = SentenceCache(maxsize=3)
+    text = "Best regards, Robert Johnson. Your case 12345 is open."
+    first = Document.analyze(text, cache=cache)
+    names = NameFilter()._find_name_runs(first)
+    assert cache.info()['misses'] == 2 and len(cache) == 2
+
+    second = Document.analyze("Hello. " + text, cache=cache)
+    assert cache.hits == 2
+    assert [t.text for t in second.tokens[2:]] == [t.text for t in first.tokens]
+    assert second.sentences[1].tags == first.sentences[0].tags
+    assert second.tokens[2].start == len("Hello. ")
+    assert NameFilter()._find_name_runs(second) == [
+        (title, [t._replace(start=t.start + 7, end=t.end + 7) for t in parts])
+        for title, parts in names
+    ]
+
+    # Least recently used sentences are evicted beyond maxsize
+    Document.analyze("Thanks for writing.", cache=cache)
+    assert len(cache) == 3
+    assert cache.get("Hello.") is None
+    cache.resize(0)
+    assert len(cache) == 0
+    Document.analyze(text, cache=cache)
+    assert len(cache) == 0
+
+def test_sentence_cache_bounds_length():
+    """Test that the cache is bounded by total length and skips long sentences."""
+    from anonymizer.document import SentenceCache
+
+    cache = SentenceCache(maxsize=100, max_chars=40, max_sentence_chars=30)
+    Document.analyze("Your case 12345 is open. " + "x" * 40 + ".", cache=cache)
+    assert len(cache) == 1 and cache.info()['chars'] == len("Your case 12345 is open.")
+
+    Document.analyze("Thanks for writing.", cache=cache)
+    assert cache.get("Your case 12345 is open.") is None
+    assert len(cache) == 1 and cache.info()['chars'] == len("Thanks for writing.")
+
+    cache.clear()
+    assert cache.info()['chars'] == 0
+
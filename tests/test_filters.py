@@ -46,4 +46,71 @@ def test_id_filter():
     assert len(ids) == 3
     assert "12345" in ids
     assert "ABC-123-XYZ" in ids
-    assert "123456" in ids
\ No newline at end of file
+    assert "123456" in ids
+
+def test_id_filter_skips_tagging_without_indicators():
+    """Test that text without ID indicator words is never POS-tagged."""
+    from anonymizer.document import Document
+
+    filter = IdFilter()
+    document = Document.analyze("The build took 123456 ms. Nothing else happened today.")
+
+    assert filter.find_in_document(document) == []
+    assert all(sentence._tags is None for sentence in document.sentences)
+
+def test_name_filter_gazetteer():
+    """Test that known names trim untitled proper noun runs and rejection is opt-in."""
+    from anonymizer.document import Document
+
+    filter = NameFilter()
+    document = Document.analyze("connection reset by peer. retry scheduled.")
+
+    assert filter.find_in_document(document) == []
+    assert all(sentence._tags is None for sentence in document.sentences)
+
+    tokens = Document.analyze("Hi John Smith").tokens
+    assert [t.text for t in filter._confirm_name(tokens)] == ['John', 'Smith']
+    unknown = Document.analyze("Priya Raman").tokens
+    assert filter._confirm_name(unknown) == unknown
+    assert NameFilter(reject_unknown=True)._confirm_name(unknown) == []
+
+    # Without the gazetteer a capitalized first word is still a candidate
+    sentence = Document.analyze("Priya called.").tokens
+    assert not filter._may_contain_name(sentence)
+    assert NameFilter(use_gazetteer=False)._may_contain_name(sentence)
+
+def test_name_filter_keeps_unknown_names():
+    """Test that names missing from the name lists are still replaced."""
+    from anonymizer.document import Document
+
+    text = "Hi John, meet Fatima. Please forward this to Priya Raman today."
+    spans = NameFilter().find_spans(Document.analyze(text, tier='fast'))
+
+    assert [text[span.start:span.end] for span in spans] == ['John', 'Fatima', 'Priya Raman']
+    assert [span.score for span in spans] == [1.0, NameFilter.UNKNOWN_NAME_SCORE,
+                                              NameFilter.UNKNOWN_NAME_SCORE]
+
+def test_name_filter_surname_first_sentence():
+    """Test that a sentence starting with a known surname is not skipped."""
+    from anonymizer.document import Document
+
+    filter = NameFilter()
+    document = Document.analyze("Smith called about account number 12345.")
+
+    assert filter._may_contain_name(document.tokens)
+    assert [name['first'] for name in filter.find_in_document(document)] == ['Smith']
+
+def test_name_filter_spans():
+    """Test that name spans carry offsets and title/first/last subfields."""
+    from anonymizer.document import Document
+
+    text = "Dear Dr. Jane Wilson, welcome."
+    spans = NameFilter().find_spans(Document.analyze(text))
+
+    assert len(spans) == 1
+    span = spans[0]
+    assert span.entity_type == 'name'
+    assert text[span.start:span.end] == "Dr. Jane Wilson"
+    assert not span.subfield('TITLE').replace
+    assert text[span.subfield('FIRST_NAME').start:span.subfield('FIRST_NAME').end] == "Jane"
+    assert text[span.subfield('LAST_NAME').start:span.subfield('LAST_NAME').end] == "Wilson"
@@ -0,0 +1,61 @@
+from anonymizer.core import Anonymizer
+from anonymizer.document import SentenceCache
+from anonymizer.mail import MailAnonymizer, read_mbox
+
+FIRST = """From robert@example.com Mon Jan  1 00:00:00 2024
+From: Robert Johnson <robert@example.com>
+To: "Wilson, Jane" <jane@example.com>
+Subject: Case 12345
+Message-ID: <1@example.com>
+Content-Type: text/plain; charset=utf-8
+
+Dear Dr. Jane Wilson,
+
+Your case 12345 is open.
+
+-- 
+Robert Johnson
+"""
+
+REPLY = """From jane@example.com Mon Jan  1 01:00:00 2024
+From: Jane Wilson <jane@example.com>
+To: Robert Johnson <robert@example.com>
+Subject: Re: Case 12345
+Message-ID: <2@example.com>
+In-Reply-To: <1@example.com>
+References: <1@example.com>
+Content-Type: text/plain; charset=utf-8
+
+Thanks, I will call you.
+
+> Dear Dr. Jane Wilson,
+>
+> Your case 12345 is open.
+>
+> -- 
+> Robert Johnson
+"""
+
+def test_mbox_thread(tmp_path):
+    """Test that a thread shares one mapping and quoted blocks are analyzed once."""
+    path = tmp_path / "archive.mbox"
+    path.write_text(FIRST + "\n" + REPLY)
+    originals = [message.get_content() for message in read_mbox(path)]
+
+    mail = MailAnonymizer(Anonymizer(sentence_cache=SentenceCache(0)))
+    first, reply = mail.anonymize_mbox(path)
+
+    assert first.thread == reply.thread == '<1@example.com>'
+    assert str(first.message['From']) == '"<FIRST_NAME_1> <LAST_NAME_1>" <robert@example.com>'
+    assert str(first.message['To']) == '"<LAST_NAME_2>, <FIRST_NAME_2>" <jane@example.com>'
+    assert str(reply.message['From']) == '"<FIRST_NAME_2> <LAST_NAME_2>" <jane@example.com>'
+    assert str(reply.message['Subject']) == 'Re: Case <ID_1>'
+
+    body = reply.message.get_content()
+    assert "Wilson" not in body and "Robert" not in body
+    assert "> Dear Dr. <FIRST_NAME_2> <LAST_NAME_2>," in body
+    assert reply.mapping.restore(body) == originals[1]
+    assert first.mapping.restore(first.message.get_content()) == originals[0]
+
+    # The quoted text and signature were already anonymized in the first message
+    assert mail.stats()['reused_blocks'] >= 2
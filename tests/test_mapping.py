@@ -0,0 +1,85 @@
+from anonymizer.mapping import SubstitutionMapping
+
+def test_streaming_restorer_split_placeholders():
+    """Test restoring placeholders split across stream deltas."""
+    mapping = SubstitutionMapping({'<FIRST_NAME_12>': 'John', '<ID_1>': '12345'})
+    restorer = mapping.stream_restorer()
+
+    deltas = ['Hello <FI', 'RST_NA', 'ME_1', '2>, case <', 'ID_1> ', 'a < b <x']
+    emitted = [restorer.feed(delta) for delta in deltas]
+    emitted.append(restorer.flush())
+
+    assert ''.join(emitted) == 'Hello John, case 12345 a < b <x'
+    # Only the ambiguous suffix is held back
+    assert emitted[:3] == ['Hello ', '', '']
+    assert emitted[4] == '12345 '
+    assert emitted[5] == 'a < b <x'
+
+def test_mapping_is_immutable_and_picklable():
+    """Test that mappings cannot be modified and survive pickling."""
+    import pickle
+    import pytest
+
+    mapping = SubstitutionMapping({'<ID_1>': '12345'}, {'12345': '<ID_1>'})
+
+    with pytest.raises(TypeError):
+        mapping['<ID_2>'] = '67890'
+    with pytest.raises(TypeError):
+        mapping.reverse['67890'] = '<ID_2>'
+
+    copy = pickle.loads(pickle.dumps(mapping))
+    assert copy == mapping
+    assert copy.restore('case <ID_1>') == 'case 12345'
+
+def test_packed_mapping_roundtrip(tmp_path):
+    """Test the binary mapping format, loaded from bytes and from an mmap."""
+    import mmap
+    import pytest
+    from anonymizer.packed import PackedMapping, pack_mapping
+
+    mapping = SubstitutionMapping({
+        '<FIRST_NAME_1>': 'Jane', '<LAST_NAME_1>': 'Wilson', '<FIRST_NAME_2>': 'Jane',
+        '<ID_300>': 'ÄBC-123', '<ID_7>': '12345',
+    })
+    data = pack_mapping(mapping)
+    packed = PackedMapping(data)
+
+    assert dict(packed) == dict(mapping)
+    assert packed.size == len(data)
+    assert packed['<ID_300>'] == 'ÄBC-123'
+    with pytest.raises(KeyError):
+        packed['<ID_8>']
+
+    text = 'Dear <FIRST_NAME_1> <LAST_NAME_1>, case <ID_7> and <ID_8>.'
+    assert packed.restore(text) == mapping.restore(text)
+    restorer = packed.stream_restorer()
+    assert restorer.feed('case <ID_') == 'case '
+    assert restorer.feed('30') == ''
+    assert restorer.feed('0> <X') + restorer.flush() == 'ÄBC-123 <X'
+
+    path = tmp_path / 'mappings.bin'
+    path.write_bytes(data + pack_mapping(SubstitutionMapping({'<ID_1>': '42'})))
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        loaded = list(PackedMapping.iter_buffer(buf))
+        assert [len(m) for m in loaded] == [5, 1]
+        assert loaded[1].restore('<ID_1>') == '42'
+        del loaded
+
+    with pytest.raises(ValueError):
+        PackedMapping(b'JSON{}')
+
+def test_packed_mapping_shared_between_threads():
+    """Test that threads looking up a fresh packed mapping at once index it only once."""
+    from concurrent.futures import ThreadPoolExecutor
+    from anonymizer.packed import PackedMapping, pack_mapping
+
+    mapping = SubstitutionMapping({f'<ID_{n}>': str(10000 + n) for n in range(1, 2001)})
+    packed = PackedMapping(pack_mapping(mapping))
+    text = ' '.join(mapping)
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: packed.restore(text), range(32)))
+
+    assert results == [mapping.restore(text)] * 32
+    assert len(packed) == 2000
+    assert packed._entries and all(len(numbers) == 2000 for numbers, _ in packed._entries.values())
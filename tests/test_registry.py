@@ -0,0 +1,57 @@
+from anonymizer import registry
+from anonymizer.base import BaseFilter
+from anonymizer.core import Anonymizer
+
+class CodeFilter(BaseFilter):
+    """Test filter that counts how often it is built."""
+    built = 0
+
+    def __init__(self):
+        super().__init__()
+        CodeFilter.built += 1
+
+    def find(self, text):
+        return [word for word in text.split() if word.startswith('CODE')]
+
+def test_filters_built_lazily_and_shared():
+    """Test that filters are built on first use and shared between instances."""
+    registry.register_filter('code', CodeFilter)
+    try:
+        first = Anonymizer(filters=['CODE'])
+        second = Anonymizer(filters=['code', 'unknown'])
+        assert list(first._filters) == ['code'] and 'code' in second._filters
+        assert CodeFilter.built == 0
+
+        assert first.hide_personal_data("Use CODE42 now") == "Use <CODE_1> now"
+        assert second._filters['code'] is first._filters['code']
+        assert CodeFilter.built == 1
+    finally:
+        registry._registry.pop('code')
+        registry._instances.pop('code', None)
+
+def test_filters_from_entry_points(monkeypatch):
+    """Test that entry point filters are listed without importing them."""
+    from importlib.metadata import EntryPoint
+
+    entry_point = EntryPoint('code', 'tests.test_registry:CodeFilter', registry.ENTRY_POINT_GROUP)
+    monkeypatch.setattr(registry, 'entry_points', lambda group: [entry_point])
+    monkeypatch.setattr(registry, '_entry_points_loaded', False)
+    monkeypatch.setattr(registry, '_registry', dict(registry.BUILTIN_FILTERS))
+    monkeypatch.setattr(registry, '_instances', {})
+
+    assert registry.available_filters() == ['id', 'name', 'code']
+    assert isinstance(registry.get_filter('code'), CodeFilter)
+
+def test_custom_filter_name_placeholders_restore():
+    """Test that placeholders of a filter name outside A-Z, 0-9 and '_' are restored."""
+    registry.register_filter('code-de', CodeFilter)
+    try:
+        anon = Anonymizer(filters=['code-de'])
+        anonymized = anon.hide_personal_data("Use CODE42 now")
+
+        assert anonymized == "Use <CODE_DE_1> now"
+        assert anon.fill_personal_data(anonymized) == "Use CODE42 now"
+        assert list(anon.fill_personal_data_stream(["Use <CODE_", "DE_1> now"])) == ["Use ", "CODE42 now"]
+    finally:
+        registry._registry.pop('code-de')
+        registry._instances.pop('code-de', None)
@@ -0,0 +1,45 @@
+from anonymizer.core import Anonymizer
+
+def test_session_append_and_edit():
+    """Test that a session keeps placeholders stable and re-analyzes only changed sentences."""
+    session = Anonymizer(filters=['id']).session("Your case 12345 is open. ")
+    assert session.anonymized == "Your case <ID_1> is open. "
+
+    assert session.append("Case 67890 is open too. ") == "Case <ID_2> is open too. "
+    assert session.append("Thanks. ") == "Thanks. "
+    assert session.reanalyzed == 3
+
+    # Insert a new ID before the others; existing numbers do not change
+    edited = "Case 55555 is new. " + session.text.replace("too", "as well")
+    anonymized = session.update(edited)
+    assert anonymized == ("Case <ID_3> is new. Your case <ID_1> is open. "
+                          "Case <ID_2> is open as well. Thanks. ")
+    assert session.text == edited
+    assert session.mapping.restore(anonymized) == edited
+    # The changed sentences are redone together with the sentence after them
+    assert session.reanalyzed == 3 + 4
+
+    assert session.update(edited) == anonymized
+    assert session.reanalyzed == 7
+
+def test_session_masks_repeated_ids():
+    """Test that a session masks repeated IDs like hide_personal_data does."""
+    anonymizer = Anonymizer(filters=['id'])
+    text = "Your case 12345 is open. Please quote 12345 when replying."
+    assert anonymizer.session(text).anonymized == anonymizer.hide_personal_data(text)
+
+    # Repeated in a later message, and mentioned before the sentence that identifies it
+    session = anonymizer.session("Please quote 67890 when replying. ")
+    assert session.append("I quoted 67890 too. ") == "I quoted 67890 too. "
+    session.append("My account number is 67890. ")
+    whole = anonymizer.hide_personal_data(session.text)
+    assert session.anonymized == whole
+    assert '67890' not in whole
+
+def test_session_masks_ids_repeated_in_one_append():
+    """Test that an ID found in a later sentence of the same text is masked in an earlier one."""
+    anonymizer = Anonymizer(filters=['id'])
+    text = "Please quote 12345 now. Your case 12345 is open. "
+
+    assert anonymizer.session(text).anonymized == anonymizer.hide_personal_data(text)
+    assert anonymizer.session().append(text) == "Please quote <ID_1> now. Your case <ID_1> is open. "
@@ -0,0 +1,54 @@
+import csv
+import io
+import numpy as np
+from anonymizer.core import Anonymizer
+from anonymizer.table import TableAnonymizer
+
+def test_csv_deduplicates_values():
+    """Test that repeated values are analyzed once and share placeholders across columns."""
+    rows = [['account', 'notes', 'amount']] + [
+        ['55501234', 'Your case 12345 is open', '10'],
+        ['55501234', 'Your case 12345 is open', '20'],
+        ['12345', '', '30'],
+    ]
+    source = io.StringIO()
+    csv.writer(source).writerows(rows)
+    source.seek(0)
+
+    table = TableAnonymizer(Anonymizer(filters=['id']), columns={'account': 'id', 'notes': ['id']})
+    output = io.StringIO()
+    table.anonymize_csv(source, output)
+
+    assert list(csv.reader(io.StringIO(output.getvalue()))) == [
+        ['account', 'notes', 'amount'],
+        ['<ID_1>', 'Your case <ID_2> is open', '10'],
+        ['<ID_1>', 'Your case <ID_2> is open', '20'],
+        ['<ID_2>', '', '30'],
+    ]
+    assert table.stats() == {'cells': 6, 'unique_values': 3}
+    assert table.mapping.restore('<ID_1> <ID_2>') == '55501234 12345'
+
+def test_numpy_columns():
+    """Test that NumPy object columns are anonymized and scattered back."""
+    table = TableAnonymizer(columns={'account': 'id'})
+    values = np.array(['111222', None, '111222', 333444], dtype=object)
+    result = table.anonymize_columns({'account': values, 'other': [1, 2]})
+
+    assert isinstance(result['account'], np.ndarray)
+    assert result['account'].tolist() == ['<ID_1>', None, '<ID_1>', '<ID_2>']
+    assert result['other'] == [1, 2]
+    assert table.stats()['unique_values'] == 2
+
+def test_entity_columns_share_filter_placeholders():
+    """Test that entity columns are numbered together with the filters of the same type."""
+    table = TableAnonymizer(Anonymizer(filters=['id']),
+                            columns={'account': 'ID', 'customer': 'name', 'notes': ['id']})
+    rows = list(table.anonymize_rows([
+        {'account': '777777', 'customer': 'John Doe', 'notes': 'Your case 12345 is open'},
+        {'account': '12345', 'customer': 'Doe, John', 'notes': ''},
+    ]))
+
+    assert rows[0] == {'account': '<ID_1>', 'customer': '<FIRST_NAME_1> <LAST_NAME_1>',
+                       'notes': 'Your case <ID_2> is open'}
+    assert rows[1] == {'account': '<ID_2>', 'customer': '<LAST_NAME_1>, <FIRST_NAME_1>', 'notes': ''}
+    assert table.mapping.restore('Your case <ID_2> is open') == 'Your case 12345 is open'
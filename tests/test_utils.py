@@ -0,0 +1,53 @@
+import pytest
+from anonymizer import utils
+from anonymizer.utils import MissingResourceError, require_resources, set_offline
+
+def test_offline_mode_never_downloads(monkeypatch):
+    """Test that offline mode raises instead of downloading."""
+    monkeypatch.setattr(utils.nltk, 'download', lambda *args, **kwargs: pytest.fail("download attempted"))
+    set_offline(True)
+    try:
+        with pytest.raises(MissingResourceError):
+            require_resources(('corpora/does_not_exist', 'does_not_exist'))
+    finally:
+        set_offline(False)
+
+def test_resources_verified_once(monkeypatch):
+    """Test that a resource is looked up at most once per process."""
+    calls = []
+    monkeypatch.setattr(utils.nltk.data, 'find', lambda path: calls.append(path))
+    monkeypatch.setattr(utils, '_verified_resources', set())
+
+    for _ in range(3):
+        require_resources(utils.PUNKT, utils.PERCEPTRON_TAGGER)
+
+    assert calls == ['tokenizers/punkt', 'taggers/averaged_perceptron_tagger']
+
+def test_numpy_tagger_matches_nltk():
+    """Test that the NumPy tagger backend gives nltk's tags."""
+    from anonymizer.document import Document, SentenceCache
+    from anonymizer.tagger import NumpyPerceptronTagger
+
+    text = ("Dear Dr. Jane Wilson, your case 12345 is open. "
+            "Please call Robert Johnson at the Boston office tomorrow. "
+            "Thanks! The reference ABC-123 was sent on 3 May 2021 by Mr. O'Neil.")
+    sentences = [[t.text for t in s.tokens] for s in Document.analyze(text).sentences]
+    reference = utils.PerceptronTagger()
+    fast = NumpyPerceptronTagger(reference)
+
+    expected = [reference.tag(words) for words in sentences]
+    assert fast.tag_sents(sentences) == expected
+    assert [fast.tag(words) for words in sentences] == expected
+    assert fast.tag_sents([[], sentences[0]]) == [[], expected[0]]
+
+    utils.set_tagger_backend('numpy')
+    try:
+        assert isinstance(utils.get_tagger(), NumpyPerceptronTagger)
+        document = Document.analyze(text, cache=SentenceCache(0))
+        document.tag_sentences()
+        assert [s.tagged for s in document.sentences] == expected
+    finally:
+        utils.set_tagger_backend('nltk')
+    assert not isinstance(utils.get_tagger(), NumpyPerceptronTagger)
+    with pytest.raises(ValueError):
+        utils.set_tagger_backend('fast')
@@ -0,0 +1,44 @@
+import pytest
+from anonymizer.core import Anonymizer
+from anonymizer.vault import PseudonymVault
+
+def test_stable_placeholders_across_documents(tmp_path):
+    """Test that the same entity keeps its placeholder across documents and instances."""
+    path = str(tmp_path / "vault.db")
+    anon = Anonymizer(filters=['id'], vault=PseudonymVault(path))
+
+    first = anon.hide_personal_data("Your case 12345 is open")
+    second = anon.hide_personal_data("Case number 67890 and case 12345")
+
+    assert first == "Your case <ID_1> is open"
+    assert second == "Case number <ID_2> and case <ID_1>"
+
+    # A new process only needs the vault to restore any document
+    other = Anonymizer(filters=['id'], vault=PseudonymVault(path))
+    assert other.hide_personal_data("See case 67890") == "See case <ID_2>"
+    assert other.fill_personal_data(first + " / " + second) == (
+        "Your case 12345 is open / Case number 67890 and case 12345"
+    )
+
+def test_vault_batches_lookups(tmp_path):
+    """Test that entities are assigned with one transaction per document."""
+    vault = PseudonymVault(str(tmp_path / "vault.db"), cache_size=2)
+    statements = []
+    vault._conn.set_trace_callback(statements.append)
+
+    numbers = vault.assign([('id', [None], (str(n),)) for n in range(10)])
+
+    assert sorted(numbers.values()) == list(range(1, 11))
+    assert sum(s.startswith('BEGIN') for s in statements) == 1
+    assert vault.lookup(['<ID_3>', '<ID_99>']) == {'<ID_3>': '2'}
+
+def test_vault_never_reassigns_placeholders(tmp_path):
+    """Test that an entity type rendering another type's label cannot overwrite its placeholders."""
+    vault = PseudonymVault(str(tmp_path / "vault.db"))
+    vault.assign([('id', [None], ('12345',))])
+
+    with pytest.raises(ValueError):
+        vault.assign([('account', ['ID'], ('777777',))])
+
+    assert vault.restore("Your case <ID_1> is open") == "Your case 12345 is open"
+    assert vault.assign([('id', [None], ('67890',))]) == {('id', ('67890',)): 2}